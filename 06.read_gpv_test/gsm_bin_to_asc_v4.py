@@ -1,7 +1,8 @@
 # coding: utf-8
 
-import os, subprocess
+import os, subprocess, pickle
 import datetime, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pygrib
 import numpy as np
 import pandas as pd
@@ -40,6 +41,17 @@ def get_gsm_surf_file_name(year, month, day, hh):
         
     return filename
     
+##################################################
+# 変換後のpickleファイル名を取得する
+##################################################
+def get_gsm_pickle_file_name(kind, date):
+    # ファイル名を設定する
+    #   ex) GSM_pall_2017_01_02.pickle
+    filename = 'GSM_{0:s}_{1:04d}_{2:02d}_{3:02d}.pickle'.format(
+        kind, date.year, date.month, date.day)
+        
+    return filename
+    
 ##################################################
 # URLを取得する
 ##################################################
@@ -235,10 +247,36 @@ def download_gsm_files(output_dir, start_year, start_month, start_day, days):
 # GSMの指定気圧面データをGRIB2からDataFrameに変換しpickle形式で保存する
 ##################################################
 def gsm_pall_grib2_to_dataframe_pickle(input_dir, output_dir, start_date):
+    _gsm_grib2_to_dataframe_pickle_one_day(
+        'pall', input_dir, output_dir, start_date, 
+        get_gsm_pall_file_name, select_gsm_pall_messages)
+
+##################################################
+# GSMの地表データをGRIB2からDataFrameに変換しpickle形式で保存する
+##################################################
+def gsm_surf_grib2_to_dataframe_pickle(input_dir, output_dir, start_date):
+    _gsm_grib2_to_dataframe_pickle_one_day(
+        'surf', input_dir, output_dir, start_date, 
+        get_gsm_surf_file_name, select_gsm_surf_messages)
+
+##################################################
+# GSMのGRIB2ファイル(1日分)をDataFrameに変換しpickle形式で保存する
+##################################################
+def _gsm_grib2_to_dataframe_pickle_one_day(kind, input_dir, output_dir, start_date, 
+                                            get_file_name, select_messages):
+    """ GSMのGRIB2ファイル(1日分)をDataFrameに変換しpickle形式で保存する
+    
+    Args:
+        kind(string)            : 'pall' or 'surf'
+        input_dir(string)       : GRIB2ファイルの格納ディレクトリ
+        output_dir(string)      : pickleファイルの出力先ディレクトリ
+        start_date(date)        : 変換する日付(日本時間)
+        get_file_name(function) : GRIB2ファイル名を取得する関数
+        select_messages(function) : 学習に用いるメッセージを選択する関数
+    """
     
     # 出力ファイル名
-    output_filename = 'GSM_pall_{0:04d}_{1:02d}_{2:02d}.pickle'.format(
-        start_date.year, start_date.month, start_date.day)
+    output_filename = get_gsm_pickle_file_name(kind, start_date)
     output_filepath = os.path.join(output_dir, output_filename)
     
     # ファイルが存在する場合は終了
@@ -249,8 +287,10 @@ def gsm_pall_grib2_to_dataframe_pickle(input_dir, output_dir, start_date):
     # 日付を前日に変更してから処理を開始する
     date = start_date - datetime.timedelta(days=1)
 
-    # 格納用のDataFrameを用意する
-    hh_df = None
+    # 初期時刻ごとの列名・物理量・時刻を格納するリスト
+    column_names_list = []
+    values_list = []
+    hours = []
     
     # 処理時間計測クラス
     stop_watch = StopWatch()
@@ -264,9 +304,6 @@ def gsm_pall_grib2_to_dataframe_pickle(input_dir, output_dir, start_date):
         # 日を跨いだらdayを1加算する
         if hh == 0:
             date = date + datetime.timedelta(days=1)
-            #year = date.year
-            #month = date.month
-            #day = date.day
         
         # 年月日を取得
         year = date.year
@@ -275,262 +312,453 @@ def gsm_pall_grib2_to_dataframe_pickle(input_dir, output_dir, start_date):
     
         # DEBUG
         print("==================================================")
-        print('{0:04d}/{1:02d}/{2:02d} {3:02d}:00 PALL'.format(year, month, day, hh))
+        print('{0:04d}/{1:02d}/{2:02d} {3:02d}:00 {4:s}'.format(year, month, day, hh, kind.upper()))
         
-        # ファイル名を取得する
-        filename = get_gsm_pall_file_name(year, month, day, hh)
+        # GRIB2ファイルから学習に用いるデータを取り出す
+        filename = get_file_name(year, month, day, hh)
         filepath = os.path.join(input_dir, filename)
+        column_names, values = decode_gsm_grib2_file(filepath, select_messages)
         
-        # GRIB2ファイルを読み込む
-        grbs = pygrib.open(filepath)
-
-        # 列名リストとndarrayを準備する
-        column_names = []
-        values_array = np.empty(0)
-        
-        # 指定気圧面のうち学習に用いるデータのみを取り出し、
-        # values_arrayに追加する
-        for grb in grbs:
-            
-            # 指定気圧面のデータを取り出す
-            levels = get_gsm_mandatory_levels()
-            for level in levels:
-            
-                # 指定気圧面、初期時刻のデータ以外の場合は飛ばす
-                if (grb.level != level) or (grb.forecastTime != 0):
-                    continue
-                
-                # 重要パラメータかを判定し、重要でないパラメータはCSVに出力しない
-                if is_parameter_important_in_gsm_pall(grb.parameterName):
-                    pass
-                else:
-                    continue
-                
-                # パラメータ名を日本語に変換する
-                param_name = paramet_name_to_japanese(grb.parameterName)
-                if param_name is None:
-                    continue
-                
-                # DEBUG
-                #print("==============================")
-                #print('Level:{0:d}, Parameter name: {1:s}'.format(level, grb.parameterName))
-                
-                # 指定した(緯度,経度)に含まれる格子点のデータを抽出する
-                lat_min, lat_max, lon_min, lon_max = get_gsm_latlons()
-                data, latitudes, longitudes = grb.data(lat1=lat_min, lat2=lat_max, lon1=lon_min, lon2=lon_max)
-                #print(data.shape, latitudes.min(), latitudes.max(), longitudes.min(), longitudes.max())
-
-                # 物理量, 緯度, 経度を一次元化する
-                values = data.reshape(-1,)
-                latitudes = latitudes.reshape(-1,)
-                longitudes = longitudes.reshape(-1,)
-
-                # 列名を作成し、リストに追加する
-                for i in range(latitudes.shape[0]):
-                    column_name = '{0:d}hPa_lat{1:.2f}_long{2:.3f}_{3:s}'.format(
-                        level, latitudes[i], longitudes[i], param_name)
-                    column_names.append(column_name)
-
-                # 物理量をndrrayに追加する
-                values_array = np.append(values_array, values)
-
-        # GRIBファイルを閉じる
-        grbs.close()
-        
-        # 物理量と列名からDataFrameを作成する
-        values_array = values_array.reshape(1,values_array.shape[0])
-        df = pd.DataFrame(data=values_array, columns=column_names)
+        column_names_list.append(column_names)
+        values_list.append(values)
         
         # 時刻データを追加する(UTCから日本時間に変更する)
         hh = hh + 9
         if hh >= 24: hh = hh - 24
-        df['時'] = hh
+        hours.append(hh)
         
-        # 1時刻のDataFrameを、1日分のDataFrameに追加する
-        if hh_df is None:
-            hh_df = df
-        else:
-            hh_df = hh_df.append(df, ignore_index=True)
-            
         stop_watch.stop().print_elapsed_sec('proc time')
-        
-    # 日付のデータを追加する
-    hh_df['日付'] = start_date
+    
+    # 1日分の物理量と列名からDataFrameを作成する
+    if all(names == column_names_list[0] for names in column_names_list):
+        # 全初期時刻で列が一致する場合は、物理量を1つの配列にまとめる
+        hh_df = pd.DataFrame(data=np.vstack(values_list), columns=column_names_list[0])
+    else:
+        # 列が一致しない場合は、初期時刻ごとのDataFrameを結合する
+        hh_df = pd.concat(
+            [pd.DataFrame(data=values.reshape(1, -1), columns=column_names) 
+                for column_names, values in zip(column_names_list, values_list)], 
+            ignore_index=True)
+    
+    # 日付・時刻のデータを先頭に追加する
+    hh_df.insert(0, '日付', start_date)
+    hh_df.insert(1, '時', hours)
     hh_df = hh_df.astype({'日付': 'datetime64[ns]'})
-
+    
     # 1日分のデータをpickleファイルに出力する
-    hh_df = move_datetime_column_to_top(hh_df)
-    hh_df.to_pickle(output_filepath)
+    write_pickle_atomic(hh_df, output_filepath)
 
     print(output_filepath)
 
 ##################################################
-# GSMの地表データをGRIB2からDataFrameに変換しpickle形式で保存する
+# GSM指定気圧面データのうち学習に用いるメッセージを選択する
 ##################################################
-def gsm_surf_grib2_to_dataframe_pickle(input_dir, output_dir, start_date):
-    
-    # 出力ファイル名
-    output_filename = 'GSM_surf_{0:04d}_{1:02d}_{2:02d}.pickle'.format(
-        start_date.year, start_date.month, start_date.day)
-    output_filepath = os.path.join(output_dir, output_filename)
-    
-    # ファイルが存在する場合は終了
-    if os.path.isfile(output_filepath):
-        return
+def select_gsm_pall_messages(index):
+    """ GSM指定気圧面データのうち学習に用いるメッセージを選択する
     
-    # 日本時間の最初の方(0時〜9時)は、UTCだと前日になるため
-    # 日付を前日に変更してから処理を開始する
-    date = start_date - datetime.timedelta(days=1)
-
-    # 格納用のDataFrameを用意する
-    hh_df = None
+    Args:
+        index(list[dict]) : GRIB2ファイルのインデックス
     
-    # 処理時間計測クラス
-    stop_watch = StopWatch()
+    Returns:
+        list[tuple] : (インデックスのエントリ, 層の名称, パラメータ名)のリスト
+    """
+    levels = set(get_gsm_mandatory_levels())
     
-    # 初期時刻ごとに処理する
-    for hh in get_gsm_initial_hours():
+    messages = []
+    for entry in index:
         
-        # DEBUG
-        stop_watch.start()
+        # 指定気圧面、初期時刻のデータ以外の場合は飛ばす
+        if (entry['level'] not in levels) or (entry['forecastTime'] != 0):
+            continue
         
-        # 日を跨いだらdayを1加算する
-        if hh == 0:
-            date = date + datetime.timedelta(days=1)
-            #year = date.year
-            #month = date.month
-            #day = date.day
+        # 重要パラメータかを判定し、重要でないパラメータは出力しない
+        if not is_parameter_important_in_gsm_pall(entry['parameterName']):
+            continue
         
-        # 年月日を取得
-        year = date.year
-        month = date.month
-        day = date.day
+        # パラメータ名を日本語に変換する
+        param_name = paramet_name_to_japanese(entry['parameterName'])
+        if param_name is None:
+            continue
         
-        # DEBUG
-        print("==================================================")
-        print('{0:04d}/{1:02d}/{2:02d} {3:02d}:00 SURF'.format(year, month, day, hh))
+        messages.append((entry, '{0:d}hPa'.format(entry['level']), param_name))
+    
+    return messages
+
+##################################################
+# GSM地表データのうち学習に用いるメッセージを選択する
+##################################################
+def select_gsm_surf_messages(index):
+    """ GSM地表データのうち学習に用いるメッセージを選択する
+    
+    Args:
+        index(list[dict]) : GRIB2ファイルのインデックス
+    
+    Returns:
+        list[tuple] : (インデックスのエントリ, 層の名称, パラメータ名)のリスト
+    """
+    time_ranges = get_time_precipitation_time_ranges()
+    
+    messages = []
+    for entry in index:
         
-        # ファイル名を取得する
-        filename = get_gsm_surf_file_name(year, month, day, hh)
-        filepath = os.path.join(input_dir, filename)
+        # 初期時刻のデータ以外であれば飛ばす
+        if entry['forecastTime'] != 0:
+            continue
         
-        # GRIB2ファイルを読み込む
-        grbs = pygrib.open(filepath)
-
-        # 列名リストとndarrayを準備する
-        column_names = []
-        values_array = np.empty(0)
+        # 重要パラメータかを判定し、重要でないパラメータは出力しない
+        if not is_parameter_important_in_gsm_surf(entry['parameterName']):
+            continue
         
-        # 学習に用いるデータのみを取り出し、values_arrayに追加する
-        for grb in grbs:
-            
-             # 初期時刻のデータ以外であれば飛ばす
-            if grb.forecastTime != 0:
-                 continue
-            
-            # 重要パラメータかを判定し、重要でないパラメータはCSVに出力しない
-            if is_parameter_important_in_gsm_surf(grb.parameterName):
-                pass
+        # 積算降水量のうち、指定した時間積算量のみ出力する
+        total_precipitation_time_range = None
+        if entry['parameterName'] == 'Total precipitation':
+            if entry['lengthOfTimeRange'] in time_ranges:
+                total_precipitation_time_range = entry['lengthOfTimeRange']
             else:
                 continue
-            
-            # 積算降水量のうち、指定した時間積算量のみCSVに出力する
-            total_precipitation_time_range = None
-            if grb.parameterName == 'Total precipitation':
-                if grb.lengthOfTimeRange in get_time_precipitation_time_ranges():
-                    total_precipitation_time_range = grb.lengthOfTimeRange
-                else:
-                    continue
+        
+        # パラメータ名を日本語に変換する
+        param_name = paramet_name_to_japanese(entry['parameterName'], total_precipitation_time_range)
+        if param_name is None:
+            continue
+        
+        messages.append((entry, 'Surf', param_name))
+    
+    return messages
 
-            # DEBUG
-            #print("==============================")
-            #print('Parameter name: {0:s}'.format(grb.parameterName))
-            
-            # パラメータ名を日本語に変換する
-            param_name = paramet_name_to_japanese(grb.parameterName, total_precipitation_time_range)
-            if param_name is None:
-                continue
-            
-            # 指定した(緯度,経度)に含まれる格子点のデータを抽出する
-            lat_min, lat_max, lon_min, lon_max = get_gsm_latlons()
-            data, latitudes, longitudes = grb.data(lat1=lat_min, lat2=lat_max, lon1=lon_min, lon2=lon_max)
-            
-            # 物理量, 緯度, 経度を一次元化する
-            values = data.reshape(-1,)
-            latitudes = latitudes.reshape(-1,)
-            longitudes = longitudes.reshape(-1,)
+# 格子の定義ごとの、指定した(緯度,経度)に含まれる格子点のキャッシュ
+#   格子の定義 -> (格子点のインデックス, 緯度, 経度)
+__GRID_POINTS_CACHE = {}
 
-            # 列名を作成し、リストに追加する
-            for i in range(latitudes.shape[0]):
-                column_name = 'Surf_lat{0:.2f}_long{1:.3f}_{2:s}'.format(
-                    latitudes[i], longitudes[i], param_name)
-                column_names.append(column_name)
+# (層, パラメータ, 格子の定義)ごとの列名のキャッシュ
+#   (層の名称, パラメータ名, 格子の定義) -> 列名のリスト
+__COLUMN_NAMES_CACHE = {}
+
+##################################################
+# GRIB2ファイルから学習に用いるデータを取り出す
+##################################################
+def decode_gsm_grib2_file(filepath, select_messages):
+    """ GRIB2ファイルから学習に用いるデータを取り出す
+        
+        インデックスから選択したメッセージのみをファイル上の位置から読み出してデコードする。
+        選択したメッセージの格子点数から出力サイズを先に確定し、
+        確保済みのfloat32配列に物理量を書き込む。
+    
+    Args:
+        filepath(string)            : GRIB2ファイルのパス
+        select_messages(function)   : 学習に用いるメッセージを選択する関数
+    
+    Returns:
+        list[string]    : 列名のリスト
+        ndarray         : 物理量(float32の1次元配列)
+    """
+    
+    # インデックスから学習に用いるメッセージを選択する
+    messages = select_messages(get_grib2_index(filepath))
+    
+    with open(filepath, 'rb') as f:
+        
+        # 選択したメッセージのみをデコードし、格子点・列名を取得する
+        inventory = []
+        for entry, layer, param_name in messages:
+            f.seek(entry['offset'])
+            grb = pygrib.fromstring(f.read(entry['length']))
             
-            # 物理量をndrrayに追加する
-            values_array = np.append(values_array, values)
+            grid_key = entry['grid_key']
+            index, latitudes, longitudes = _get_grid_points(grb, grid_key)
+            names = _get_column_names(layer, param_name, grid_key, latitudes, longitudes)
+            inventory.append((grb, index, names))
+    
+    # 出力サイズを確定し、配列を確保する
+    size = sum(index.shape[0] for _, index, _ in inventory)
+    values = np.empty(size, dtype=np.float32)
+    column_names = []
+    
+    # 指定した(緯度,経度)に含まれる格子点のデータを配列に書き込む
+    offset = 0
+    for grb, index, names in inventory:
+        data = np.asarray(grb.values).reshape(-1)
+        values[offset:offset + index.shape[0]] = data[index]
+        offset += index.shape[0]
+        column_names.extend(names)
+    
+    return column_names, values
+
+##################################################
+# GRIB2ファイルのインデックスを取得する
+##################################################
+def get_grib2_index(filepath):
+    """ GRIB2ファイルのインデックスを取得する
+        
+        全メッセージのヘッダを1度だけ走査し、メッセージごとの
+        ファイル上の位置とパラメータをGRIB2ファイルと同じディレクトリに保存する。
+        保存済みのインデックスがあれば(GRIB2ファイルが更新されていない限り)それを使用する。
+    
+    Args:
+        filepath(string) : GRIB2ファイルのパス
+    
+    Returns:
+        list[dict] : メッセージごとのエントリのリスト
+    """
+    
+    # GRIB2ファイルの状態(サイズ,更新時刻)を取得する
+    stat = os.stat(filepath)
+    source = (stat.st_size, stat.st_mtime)
+    
+    # 保存済みのインデックスがあれば読み込む
+    index_filepath = '{0:s}.index.pickle'.format(filepath)
+    if os.path.isfile(index_filepath):
+        with open(index_filepath, 'rb') as f:
+            saved = pickle.load(f)
+        if saved['source'] == source:
+            return saved['entries']
+    
+    # ヘッダを走査してインデックスを作成する
+    entries = _scan_grib2_index(filepath)
+    
+    # インデックスを保存する(保存できない場合もインデックスはそのまま使用する)
+    try:
+        write_pickle_atomic({'source': source, 'entries': entries}, index_filepath)
+    except OSError:
+        pass
+    
+    return entries
 
-        # GRIBファイルを閉じる
+##################################################
+# GRIB2ファイルのヘッダを走査してインデックスを作成する
+##################################################
+def _scan_grib2_index(filepath):
+    
+    entries = []
+    grbs = pygrib.open(filepath)
+    try:
+        for grb in grbs:
+            entries.append({
+                'offset'            : grb['offset'],
+                'length'            : grb['totalLength'],
+                'parameterName'     : grb.parameterName,
+                'level'             : grb.level,
+                'forecastTime'      : grb.forecastTime,
+                'lengthOfTimeRange' : grb['lengthOfTimeRange'] if grb.has_key('lengthOfTimeRange') else None,
+                'grid_key'          : (
+                    grb['gridType'], grb['Ni'], grb['Nj'], 
+                    grb['latitudeOfFirstGridPointInDegrees'], grb['longitudeOfFirstGridPointInDegrees'],
+                    grb['latitudeOfLastGridPointInDegrees'], grb['longitudeOfLastGridPointInDegrees'],
+                ),
+            })
+    finally:
         grbs.close()
-                
-        # 物理量と列名からDataFrameを作成する
-        values_array = values_array.reshape(1,values_array.shape[0])
-        df = pd.DataFrame(data=values_array, columns=column_names)
+    
+    return entries
 
-        # 時刻データを追加する(UTCから日本時間に変更する)
-        hh = hh + 9
-        if hh >= 24: hh = hh - 24
-        df['時'] = hh
-        
-        # 1時刻のDataFrameを、1日分のDataFrameに追加する
-        if hh_df is None:
-            hh_df = df
-        else:
-            hh_df = hh_df.append(df, ignore_index=True)
 
-        stop_watch.stop().print_elapsed_sec('proc time')
+##################################################
+# 指定した(緯度,経度)に含まれる格子点を取得する
+##################################################
+def _get_grid_points(grb, grid_key):
+    """ 指定した(緯度,経度)に含まれる格子点を取得する
+        (格子の定義ごとに1度だけ計算する)
+    
+    Args:
+        grb(pygrib.gribmessage) : GRIBメッセージ
+        grid_key(tuple)         : 格子の定義を表すキー
+    
+    Returns:
+        ndarray : 格子点のインデックス(一次元化した物理量に対するインデックス)
+        ndarray : 格子点の緯度
+        ndarray : 格子点の経度
+    """
+    if grid_key not in __GRID_POINTS_CACHE:
         
-    # 日付のデータを追加する
-    hh_df['日付'] = start_date
-    hh_df = hh_df.astype({'日付': 'datetime64[ns]'})
+        # 指定した(緯度,経度)に含まれる格子点を抽出する
+        # (grb.data(lat1, lat2, lon1, lon2)と同じ順序になる)
+        lat_min, lat_max, lon_min, lon_max = get_gsm_latlons()
+        latitudes, longitudes = grb.latlons()
+        latitudes = latitudes.reshape(-1,)
+        longitudes = longitudes.reshape(-1,)
+        mask = (latitudes >= lat_min) & (latitudes <= lat_max) & \
+                (longitudes >= lon_min) & (longitudes <= lon_max)
+        index = np.flatnonzero(mask)
+        
+        __GRID_POINTS_CACHE[grid_key] = (index, latitudes[index], longitudes[index])
     
-    # 1日分のデータをpickleファイルに出力する
-    hh_df = move_datetime_column_to_top(hh_df)
-    hh_df.to_pickle(output_filepath)
+    return __GRID_POINTS_CACHE[grid_key]
 
-    print(output_filepath)
+##################################################
+# 列名のリストを取得する
+##################################################
+def _get_column_names(layer, param_name, grid_key, latitudes, longitudes):
+    """ 列名のリストを取得する
+        ((層, パラメータ, 格子の定義)ごとに1度だけ作成する)
+    
+    Args:
+        layer(string)       : 層の名称 (ex) '850hPa', 'Surf'
+        param_name(string)  : パラメータ名
+        grid_key(tuple)     : 格子の定義を表すキー
+        latitudes(ndarray)  : 格子点の緯度
+        longitudes(ndarray) : 格子点の経度
+    
+    Returns:
+        list[string] : 列名のリスト
+    """
+    key = (layer, param_name, grid_key)
+    if key not in __COLUMN_NAMES_CACHE:
+        
+        # 列名を作成する
+        #   ex) '850hPa_lat38.00_long135.000_気温'
+        __COLUMN_NAMES_CACHE[key] = [
+            '{0:s}_lat{1:.2f}_long{2:.3f}_{3:s}'.format(layer, latitude, longitude, param_name)
+                for latitude, longitude in zip(latitudes, longitudes)
+        ]
+    
+    return __COLUMN_NAMES_CACHE[key]
 
 ##################################################
 # GSMの指定気圧面・地表データをGRIB2からDataFrameに変換し、
 # pickle形式で保存する
 ##################################################
-def gsm_grib2_to_dataframe_pickle(input_dir, output_dir, start_year, start_month, start_day, days):
+def gsm_grib2_to_dataframe_pickle(input_dir, output_dir, start_year, start_month, start_day, days, 
+                                    workers=1):
+    """ GSMの指定気圧面・地表データをGRIB2からDataFrameに変換し、
+        pickle形式で保存する
+        
+        (日付, pall/surf)の組み合わせを1タスクとして処理する。
+        workersに2以上を指定した場合はプロセスプールで並列に処理する。
+        変換済みのpickleファイルが存在するタスクは実行しない。
+    
+    Args:
+        input_dir(string)   : GRIB2ファイルの格納ディレクトリ
+        output_dir(string)  : pickleファイルの出力先ディレクトリ
+        start_year(int)     : 変換を開始する年
+        start_month(int)    : 変換を開始する月
+        start_day(int)      : 変換を開始する日
+        days(int)           : 変換する日数
+        workers(int)        : ワーカープロセス数(1以下の場合は逐次処理)
+    
+    Returns:
+        list[tuple] : 変換に失敗したタスク(種別, 日付, エラー内容)のリスト
+    """
     
     # 格納先ディレクトリ
-    output_pall_dir = os.path.join(output_dir, 'pall')
-    output_surf_dir = os.path.join(output_dir, 'surf')
+    output_dirs = {
+        'pall' : os.path.join(output_dir, 'pall'),
+        'surf' : os.path.join(output_dir, 'surf'),
+    }
     
     # 格納先ディレクトリを用意する
-    #os.makedirs(output_dir, exist_ok=True)
-    os.makedirs(output_pall_dir, exist_ok=True)
-    os.makedirs(output_surf_dir, exist_ok=True)
+    for kind_dir in output_dirs.values():
+        os.makedirs(kind_dir, exist_ok=True)
         
     # 取得を開始する年月日を設定
     date = datetime.date(start_year, start_month, start_day)
     
-    # 初期時刻(UTC)
-    initial_hours = get_gsm_initial_hours()
-    
-    # 指定した日数分のデータを読み込みCSCファイルに出力する
+    # 指定した日数分のタスクを作成する。
+    # 変換済みのファイルが存在する場合はタスクに加えない
+    tasks = []
+    num_skipped = 0
     for i in range(days):
-        
-        # GSMの指定気圧面データをGRIB2からDataFrameに変換しpickle形式で保存する
-        gsm_pall_grib2_to_dataframe_pickle(input_dir, output_pall_dir, date)
-        
-        # GSMの地表データをGRIB2からDataFrameに変換しpickle形式で保存する
-        gsm_surf_grib2_to_dataframe_pickle(input_dir, output_surf_dir, date)
+        for kind, kind_dir in output_dirs.items():
+            output_filepath = os.path.join(kind_dir, get_gsm_pickle_file_name(kind, date))
+            if os.path.isfile(output_filepath):
+                num_skipped += 1
+            else:
+                tasks.append((kind, input_dir, kind_dir, date))
         
         # 日付を更新する
         date = date + datetime.timedelta(days=1)
+    
+    print('tasks: {0:d}, skipped: {1:d}, workers: {2:d}'.format(
+        len(tasks), num_skipped, max(workers, 1)))
+    
+    # 処理時間計測クラス
+    stop_watch = StopWatch().start()
+    
+    # タスクを実行する
+    failures = []
+    task_times = []
+    if workers <= 1:
+        results = (_gsm_grib2_to_dataframe_pickle_task(*task) for task in tasks)
+        failures, task_times = _collect_task_results(results, len(tasks), stop_watch)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_gsm_grib2_to_dataframe_pickle_task, *task) for task in tasks]
+            results = (future.result() for future in as_completed(futures))
+            failures, task_times = _collect_task_results(results, len(tasks), stop_watch)
+    
+    # 処理結果のサマリを表示する
+    stop_watch.stop()
+    print("==================================================")
+    print('done: {0:d}, failed: {1:d}, skipped: {2:d}'.format(
+        len(task_times), len(failures), num_skipped))
+    stop_watch.print_elapsed_sec('total time')
+    if len(task_times) > 0:
+        print('task time: mean {0:.3f}[sec], max {1:.3f}[sec]'.format(
+            np.mean(task_times), np.max(task_times)))
+    for kind, date, error in failures:
+        print('failed: {0:s} {1:s} {2:s}'.format(kind, date.isoformat(), error))
+    
+    return failures
+
+##################################################
+# GRIB2からDataFrameへの変換タスク(1日分・pall/surfいずれか)を実行する
+##################################################
+def _gsm_grib2_to_dataframe_pickle_task(kind, input_dir, output_dir, date):
+    """ GRIB2からDataFrameへの変換タスクを実行する
+        (プロセスプールから呼び出すためモジュールの関数として定義する)
+    
+    Args:
+        kind(string)        : 'pall' or 'surf'
+        input_dir(string)   : GRIB2ファイルの格納ディレクトリ
+        output_dir(string)  : pickleファイルの出力先ディレクトリ
+        date(date)          : 変換する日付
+    
+    Returns:
+        tuple : (種別, 日付, 処理時間[sec], エラー内容 or None)
+    """
+    stop_watch = StopWatch().start()
+    
+    try:
+        if kind == 'pall':
+            gsm_pall_grib2_to_dataframe_pickle(input_dir, output_dir, date)
+        else:
+            gsm_surf_grib2_to_dataframe_pickle(input_dir, output_dir, date)
+        error = None
+    except Exception as e:
+        error = '{0:s}: {1:s}'.format(type(e).__name__, str(e))
+    
+    return kind, date, stop_watch.elapsed_sec, error
+
+##################################################
+# 変換タスクの実行結果を集計し、進捗を表示する
+##################################################
+def _collect_task_results(results, num_tasks, stop_watch):
+    
+    failures = []
+    task_times = []
+    for i, (kind, date, elapsed_sec, error) in enumerate(results):
+        
+        if error is None:
+            task_times.append(elapsed_sec)
+        else:
+            failures.append((kind, date, error))
+        
+        # 進捗を表示する
+        print('[{0:d}/{1:d}] {2:s} {3:s} {4:s} {5:.3f}[sec] (elapsed {6:.1f}[sec])'.format(
+            i + 1, num_tasks, date.isoformat(), kind, 
+            'OK' if error is None else 'NG', elapsed_sec, stop_watch.stop().elapsed_sec))
+        
+    return failures, task_times
+
+##################################################
+# オブジェクトをpickleファイルに出力する
+# (途中で中断されても不完全なファイルが残らないように一時ファイル経由で出力する)
+##################################################
+def write_pickle_atomic(obj, filepath):
+    
+    temp_filepath = '{0:s}.{1:d}.tmp'.format(filepath, os.getpid())
+    with open(temp_filepath, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_filepath, filepath)
         
 ##################################################
 # 日付・時刻の列を先頭に移動する
@@ -579,7 +807,10 @@ if __name__ == '__main__':
     cwd = os.getcwd()
     output_dir = os.path.join(cwd, 'input7')
     
+    # 変換に使用するワーカープロセス数
+    workers = os.cpu_count()
+    
     # GSMの指定気圧面・地表データをGRIB2からDataFrameに変換し、
     # pickle形式で保存する
-    gsm_grib2_to_dataframe_pickle(input_dir, output_dir, year, month, day, days)
+    gsm_grib2_to_dataframe_pickle(input_dir, output_dir, year, month, day, days, workers=workers)
     
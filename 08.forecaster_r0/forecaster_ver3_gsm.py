@@ -27,6 +27,8 @@ if __name__ == '__main__':
         model_parmas = {
             'xgb_param' : xbg_param, 'num_round' : 1000, 
             'early_stopping_rounds' : 40, 'verbose_eval' : 50,
+            'tree_method' : 'hist', 'max_bin' : 256, 'nthread' : None,
+            #'external_memory' : {'cache_dir' : 'temp/xgb_cache', 'batch_rows' : 100000},
             'model_dir' : 'model'
         }
         model = ModelXgboost(run_name, model_parmas)
@@ -63,7 +65,9 @@ if __name__ == '__main__':
         'class_names'           : ['Sunny', 'Cloud', 'Rain'],
         #'weather_convert_mode'  : 'rain_or_not',
         #'class_names'           : ['Except for Rain', 'Rain'],
-        'label_name'            : 'Mito_天気'
+        'label_name'            : 'Mito_天気',
+        'cv_workers'            : None,     # CVのfoldを並列に学習するプロセス数(None:fold数とCPU数の小さい方)
+        'cv_memory_bytes'       : None,     # CVのワーカーが使えるメモリの上限(None:空きの物理メモリ)
     }
     runner = GsmForecastRunner2020Ver3(run_name, model, runner_param)
     
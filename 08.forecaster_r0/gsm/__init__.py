@@ -1,2 +1,6 @@
 from gsm.gsm_read import *
 from gsm.processing import *
+from gsm.gsm_store import *
+from gsm.schema import *
+from gsm.grid import *
+from gsm.thermo import *
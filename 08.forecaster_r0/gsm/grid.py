@@ -0,0 +1,395 @@
+# coding: utf-8
+
+import numpy as np
+import pandas as pd
+
+from gsm.schema import GsmColumnSchema, get_column_schema, set_column_schema, _PRESSURE_LAYER_PATTERN
+
+##################################################
+# GSMの格子データ
+##################################################
+class GsmGrid:
+    """ GSMの格子データ
+
+        物理量を(時刻, 変数, 緯度, 経度)の連続したndarrayで保持する。
+        変数は(層, 物理量)の組み合わせ(ex) ('850hPa', '気温'))で表す。
+        DataFrame(1列 = 1格子点の1変数)との間で相互に変換できる。
+
+    Attributes:
+        latitudes (list[string])    : 緯度(列名の表記のまま)
+        longitudes (list[string])   : 経度(列名の表記のまま)
+        variables (list[tuple])     : 変数((層, 物理量))のリスト
+    """
+
+    ##################################################
+    # コンストラクタ
+    ##################################################
+    def __init__(self, latitudes, longitudes, others, columns):
+        """ コンストラクタ
+
+        Args:
+            latitudes(list[string])     : 緯度
+            longitudes(list[string])    : 経度
+            others(DataFrame)           : 格子点以外の列(日付,時等)
+            columns(list[string])       : 元のDataFrameの列の並び
+        """
+        self.latitudes = list(latitudes)
+        self.longitudes = list(longitudes)
+        self._others = others
+        self._columns = list(columns)
+
+        # 変数のブロックのリスト
+        #   keys    : 変数のリスト
+        #   values  : 物理量 (時刻, 変数, 緯度, 経度)
+        #   present : 格子点の有無 (変数, 緯度, 経度)
+        self._blocks = []
+
+        # 変数 -> (ブロック番号, ブロック内の位置)
+        self._variable_index = {}
+
+    ##################################################
+    # DataFrameから格子データを作成する
+    ##################################################
+    @classmethod
+    def from_dataframe(cls, df):
+        """ DataFrameから格子データを作成する
+
+        Args:
+            df(DataFrame) : GSMデータ
+
+        Returns:
+            GsmGrid : 格子データ
+        """
+
+        # 列名を層,緯度,経度,物理量に分解する(列スキーマの解析結果を使う)
+        schema = get_column_schema(df)
+        grid_columns = schema.grid_columns
+        other_columns = schema.other_columns
+        parsed = [schema.parse(column) for column in grid_columns]
+
+        # 緯度,経度,変数の一覧を出現順に作成する
+        latitudes = {}
+        longitudes = {}
+        variables = {}
+        for layer, latitude, longitude, feature in parsed:
+            latitudes.setdefault(latitude, len(latitudes))
+            longitudes.setdefault(longitude, len(longitudes))
+            variables.setdefault((layer, feature), len(variables))
+
+        grid = cls(latitudes.keys(), longitudes.keys(), df[other_columns], df.columns)
+
+        # 物理量を(時刻, 変数, 緯度, 経度)の配列に配置する
+        var_idx = np.array([variables[(p[0], p[3])] for p in parsed], dtype=np.int64)
+        lat_idx = np.array([latitudes[p[1]] for p in parsed], dtype=np.int64)
+        lon_idx = np.array([longitudes[p[2]] for p in parsed], dtype=np.int64)
+
+        data = df[grid_columns].to_numpy()
+        if data.dtype.kind != 'f':
+            data = data.astype(np.float64)
+        values = np.full((len(df), len(variables), len(latitudes), len(longitudes)), np.nan, dtype=data.dtype)
+        values[:, var_idx, lat_idx, lon_idx] = data
+        present = np.zeros(values.shape[1:], dtype=bool)
+        present[var_idx, lat_idx, lon_idx] = True
+
+        grid.add_variables(list(variables.keys()), values, present)
+
+        return grid
+
+    ##################################################
+    # 格子データからDataFrameを作成する
+    ##################################################
+    def to_dataframe(self):
+        """ 格子データからDataFrameを作成する
+
+            元のDataFrameの列は元の並びのまま、追加した変数の列は
+            変数,緯度,経度の順に末尾に並べる。
+
+        Returns:
+            DataFrame : GSMデータ
+        """
+
+        # ブロックごとに列名と値を取り出す
+        names = []
+        values = []
+        known = {}
+        for block in self._blocks:
+            var_idx, lat_idx, lon_idx = np.nonzero(block['present'])
+            for v, i, j in zip(var_idx, lat_idx, lon_idx):
+                key = block['keys'][v]
+                name = self._column_name(key, self.latitudes[i], self.longitudes[j])
+                names.append(name)
+                known[name] = (key[0], self.latitudes[i], self.longitudes[j], key[1])
+            values.append(block['values'][:, var_idx, lat_idx, lon_idx])
+
+        # 列の並びを決める(元の列 -> 追加した列)
+        name_set = set(names)
+        other_set = set(self._others.columns)
+        original = [col for col in self._columns if (col in name_set) or (col in other_set)]
+        original_set = set(original)
+        order = original + [col for col in names if col not in original_set]
+
+        # DataFrameを作成する
+        if len(values) == 1:
+            grid_values = values[0]
+        else:
+            dtype = np.result_type(*values)
+            grid_values = np.concatenate([v.astype(dtype, copy=False) for v in values], axis=1)
+        grid_df = pd.DataFrame(grid_values, columns=names, index=self._others.index)
+        df = pd.concat([self._others, grid_df], axis=1)
+        if list(df.columns) != order:
+            df = df[order]
+
+        # 列名の解析結果を列スキーマとして引き継ぐ
+        set_column_schema(df, GsmColumnSchema(df.columns, known=known))
+
+        return df
+
+    ##################################################
+    # 指定した変数のみのDataFrameを作成する
+    ##################################################
+    def variables_to_dataframe(self, keys):
+        """ 指定した変数のみのDataFrameを作成する
+            (列は変数,緯度,経度の順に並べる)
+
+        Args:
+            keys(list[tuple]) : 変数((層, 物理量))のリスト
+
+        Returns:
+            DataFrame : 指定した変数の列のみのDataFrame
+        """
+        names = []
+        values = []
+        for key in keys:
+            present = self.get_present(*key)
+            lat_idx, lon_idx = np.nonzero(present)
+            names.extend(self._column_name(key, self.latitudes[i], self.longitudes[j])
+                            for i, j in zip(lat_idx, lon_idx))
+            values.append(self.get(*key)[:, lat_idx, lon_idx])
+
+        return pd.DataFrame(np.concatenate(values, axis=1), columns=names, index=self._others.index)
+
+    ##################################################
+    # 変数を追加する
+    ##################################################
+    def add_variables(self, keys, values, present=None):
+        """ 変数を追加する
+
+        Args:
+            keys(list[tuple])   : 変数((層, 物理量))のリスト
+            values(ndarray)     : 物理量 (時刻, 変数, 緯度, 経度)
+            present(ndarray)    : 格子点の有無 (変数, 緯度, 経度)
+        """
+        if present is None:
+            present = np.ones(values.shape[1:], dtype=bool)
+
+        # 同じ変数が既にある場合は置き換える
+        for key in keys:
+            if key in self._variable_index:
+                block_no, pos = self._variable_index[key]
+                self._blocks[block_no]['present'][pos] = False
+
+        block_no = len(self._blocks)
+        self._blocks.append({'keys': list(keys), 'values': values, 'present': present})
+        for pos, key in enumerate(keys):
+            self._variable_index[key] = (block_no, pos)
+
+    ##################################################
+    # 変数の物理量を取得する
+    ##################################################
+    def get(self, layer, feature):
+        """ 変数の物理量を取得する
+
+        Args:
+            layer(string)   : 層 (ex) 'Surf', '850hPa'
+            feature(string) : 物理量 (ex) '気温'
+
+        Returns:
+            ndarray : 物理量 (時刻, 緯度, 経度)
+        """
+        block_no, pos = self._variable_index[(layer, feature)]
+        return self._blocks[block_no]['values'][:, pos]
+
+    ##################################################
+    # 変数の格子点の有無を取得する
+    ##################################################
+    def get_present(self, layer, feature):
+        block_no, pos = self._variable_index[(layer, feature)]
+        return self._blocks[block_no]['present'][pos]
+
+    ##################################################
+    # 指定気圧面の物理量を取得する
+    ##################################################
+    def stack(self, feature, layers):
+        """ 複数の層の物理量をまとめて取得する
+
+        Args:
+            feature(string)         : 物理量
+            layers(list[string])    : 層のリスト
+
+        Returns:
+            ndarray : 物理量 (時刻, 層, 緯度, 経度)
+        """
+        return np.stack([self.get(layer, feature) for layer in layers], axis=1)
+
+    ##################################################
+    # 指定した緯度,経度の格子点のみの格子データを作成する
+    ##################################################
+    def select_points(self, lat_index, lon_index):
+        """ 指定した緯度,経度の格子点のみの格子データを作成する
+
+        Args:
+            lat_index(list[int]) : 残す緯度のインデックス
+            lon_index(list[int]) : 残す経度のインデックス
+
+        Returns:
+            GsmGrid : 格子データ
+        """
+        lat_index = np.asarray(lat_index, dtype=np.int64)
+        lon_index = np.asarray(lon_index, dtype=np.int64)
+
+        grid = GsmGrid(
+            [self.latitudes[i] for i in lat_index], [self.longitudes[j] for j in lon_index],
+            self._others, self._columns)
+        for block in self._blocks:
+            values = block['values'][:, :, lat_index][:, :, :, lon_index]
+            present = block['present'][:, lat_index][:, :, lon_index]
+            grid.add_variables(block['keys'], values, present)
+
+        return grid
+
+    ##################################################
+    # 格子データを複製する
+    ##################################################
+    def copy(self):
+        """ 格子データを複製する
+            (物理量の配列は変更しないため共有する)
+
+        Returns:
+            GsmGrid : 格子データ
+        """
+        grid = GsmGrid(self.latitudes, self.longitudes, self._others, self._columns)
+        for block in self._blocks:
+            grid._blocks.append({
+                'keys': block['keys'], 'values': block['values'], 'present': block['present'].copy()})
+        grid._variable_index = dict(self._variable_index)
+
+        return grid
+
+    ##################################################
+    # 格子点をブロック単位に集約する
+    ##################################################
+    def pool(self, interval, method='mean'):
+        """ 格子点を(緯度,経度)方向にinterval単位のブロックに分割し、
+            ブロックごとの平均値(最大値,最小値)を先頭の格子点の値とする
+
+            端のブロックの格子点数がintervalに満たない場合は、
+            そのブロックに含まれる格子点のみで集約する。
+
+        Args:
+            interval(tuple) : ブロックの大きさ(緯度方向, 経度方向)
+            method(string)  : 集約方法('mean', 'max', 'min')
+
+        Returns:
+            GsmGrid : 集約後の格子データ
+        """
+        if method == 'mean':
+            ufunc = np.add
+        elif method == 'max':
+            ufunc = np.maximum
+        elif method == 'min':
+            ufunc = np.minimum
+        else:
+            raise ValueError('unknown pooling method: {0:s}'.format(str(method)))
+
+        # 各ブロックの先頭のインデックスと格子点数
+        lat_starts = np.arange(0, len(self.latitudes), interval[0])
+        lon_starts = np.arange(0, len(self.longitudes), interval[1])
+        lat_sizes = np.diff(np.append(lat_starts, len(self.latitudes)))
+        lon_sizes = np.diff(np.append(lon_starts, len(self.longitudes)))
+
+        grid = GsmGrid(
+            [self.latitudes[i] for i in lat_starts], [self.longitudes[j] for j in lon_starts],
+            self._others, self._columns)
+        for block in self._blocks:
+
+            # 緯度,経度方向にブロック単位で集約する
+            values = ufunc.reduceat(block['values'], lat_starts, axis=2)
+            values = ufunc.reduceat(values, lon_starts, axis=3)
+            if method == 'mean':
+                values /= (lat_sizes[:, np.newaxis] * lon_sizes[np.newaxis, :]).astype(values.dtype)
+
+            # 先頭の格子点の有無を引き継ぐ
+            present = block['present'][:, lat_starts][:, :, lon_starts]
+            grid.add_variables(block['keys'], values, present)
+
+        return grid
+
+    ##################################################
+    # 変数の一覧
+    ##################################################
+    @property
+    def variables(self):
+        return list(self._variable_index.keys())
+
+    ##################################################
+    # 層の一覧
+    ##################################################
+    @property
+    def layers(self):
+        layers = []
+        for layer, feature in self._variable_index.keys():
+            if layer not in layers:
+                layers.append(layer)
+        return layers
+
+    ##################################################
+    # 指定気圧面の一覧
+    ##################################################
+    @property
+    def pressure_layers(self):
+        return [layer for layer in self.layers if _PRESSURE_LAYER_PATTERN.search(layer)]
+
+    ##################################################
+    # 物理量の一覧
+    ##################################################
+    def features(self, layer=None):
+        features = []
+        for key_layer, feature in self._variable_index.keys():
+            if (layer is None) or (key_layer == layer):
+                if feature not in features:
+                    features.append(feature)
+        return features
+
+    ##################################################
+    # 指定した変数を含むか否か
+    ##################################################
+    def has(self, layer, feature):
+        return (layer, feature) in self._variable_index
+
+    ##################################################
+    # 時刻数
+    ##################################################
+    @property
+    def num_times(self):
+        return len(self._others)
+
+    ##################################################
+    # 緯度の数値
+    ##################################################
+    @property
+    def latitude_values(self):
+        return np.array([float(lat) for lat in self.latitudes])
+
+    ##################################################
+    # 経度の数値
+    ##################################################
+    @property
+    def longitude_values(self):
+        return np.array([float(lon) for lon in self.longitudes])
+
+    ##################################################
+    # 列名を作成する
+    ##################################################
+    @staticmethod
+    def _column_name(key, latitude, longitude):
+        return "{0:s}_lat{1:s}_long{2:s}_{3:s}".format(key[0], latitude, longitude, key[1])
@@ -6,7 +6,9 @@ import util
 import wdfproc
 
 import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 ##################################################
 # GSMデータのCSVファイルを読み込む
@@ -37,11 +39,13 @@ def load_gsm_csv(input_dir):
 # 指定したディレクトリに格納されている
 # GSMデータのCSVファイルを読み込む
 ##################################################
-def load_gsm_csv_one_dir(dir_path):
+def load_gsm_csv_one_dir(dir_path, workers=None):
     """ GSMデータのCSVファイルを読み込む
+        (CSVの解析はCPU負荷が高いため、プロセスプールで並列に読み込む)
     
     Args:
-        dir_path(string) : ディレクトリパス
+        dir_path(string)    : ディレクトリパス
+        workers(int)        : ワーカー数(Noneの場合はCPU数に応じて決定)
 
     Returns:
         DataFrame : ファイルの読込結果
@@ -50,42 +54,7 @@ def load_gsm_csv_one_dir(dir_path):
     # 指定ディレクトリのCSVファイル一覧取得
     file_paths = util.get_file_paths(dir_path, '.csv')
     
-    # 退避用のリスト作成
-    gsm_df_list = []
-    
-    # GSMデータを読み込み、DataFrameに格納する
-    gsm_df = None
-    for file_path in file_paths:
-        
-        # CSVファイル読み込み
-        df = pd.read_csv(file_path, sep=',', skiprows=0, header=0, index_col=0, parse_dates=[1])
-        
-        # DataFrameに追加する
-        if gsm_df is None:
-            gsm_df = df
-        else:
-            gsm_df = gsm_df.append(df)
-        
-        # DataFrameに一定の行数データが溜まったらリストに退避する
-        if len(gsm_df) > 256:
-            gsm_df_list.append(gsm_df)
-            gsm_df = None
-    
-    # リストに溜まったDataFrameを結合する
-    if len(gsm_df_list) > 0:
-        
-        # リスト内のDataFrameを結合する
-        list_df = gsm_df_list[0].copy()
-        for i in range(1, len(gsm_df_list)):
-            list_df = list_df.append(gsm_df_list[i])
-    
-        # リストに登録していないDataFrameを結合する
-        if gsm_df is not None:
-            list_df = list_df.append(gsm_df)
-            
-        gsm_df = list_df
-    
-    return gsm_df
+    return _load_gsm_files(file_paths, _read_gsm_csv, ProcessPoolExecutor, workers)
     
 ##################################################
 # GSMデータのpickleファイルを読み込む
@@ -116,11 +85,13 @@ def load_gsm_pickle(input_dir):
 # 指定したディレクトリに格納されている
 # GSMデータのpickleファイルを読み込む
 ##################################################
-def load_gsm_pickle_one_dir(dir_path):
+def load_gsm_pickle_one_dir(dir_path, workers=None):
     """ GSMデータのpickleファイルを読み込む
+        (pickleの読み込みはI/Oが主体のため、スレッドプールで並列に読み込む)
     
     Args:
-        dir_path(string) : ディレクトリパス
+        dir_path(string)    : ディレクトリパス
+        workers(int)        : ワーカー数(Noneの場合はCPU数に応じて決定)
 
     Returns:
         DataFrame : ファイルの読込結果
@@ -129,41 +100,105 @@ def load_gsm_pickle_one_dir(dir_path):
     # 指定ディレクトリのpickleファイル一覧取得
     file_paths = util.get_file_paths(dir_path, '.pickle')
     
-    # 退避用のリスト作成
-    gsm_df_list = []
+    return load_gsm_pickle_files(file_paths, workers)
+
+##################################################
+# 指定したGSMデータのpickleファイルを読み込む
+##################################################
+def load_gsm_pickle_files(file_paths, workers=None):
+    """ 指定したGSMデータのpickleファイルを読み込む
     
-    # GSMデータを読み込み、DataFrameに格納する
-    gsm_df = None
-    for file_path in file_paths:
-        
-        # pickleファイル読み込み
-        #df = pd.read_csv(file_path, sep=',', skiprows=0, header=0, index_col=0, parse_dates=[1])
-        df = pd.read_pickle(file_path)
-        
-        # DataFrameに追加する
-        if gsm_df is None:
-            gsm_df = df
-        else:
-            gsm_df = gsm_df.append(df)
+    Args:
+        file_paths(list[string])    : ファイルパスのリスト
+        workers(int)                : ワーカー数(Noneの場合はCPU数に応じて決定)
+
+    Returns:
+        DataFrame : ファイルの読込結果
+    """
+    return _load_gsm_files(file_paths, _read_gsm_pickle, ThreadPoolExecutor, workers)
+
+##################################################
+# GSMデータのファイルを並列に読み込み、1つのDataFrameに結合する
+##################################################
+def _load_gsm_files(file_paths, read_file, executor_class, workers):
+    """ GSMデータのファイルを並列に読み込み、1つのDataFrameに結合する
         
-        # DataFrameに一定の行数データが溜まったらリストに退避する
-        if len(gsm_df) > 256:
-            gsm_df_list.append(gsm_df)
-            gsm_df = None
+        読み込んだファイルから順に物理量をfloat32の配列に変換して保持し、
+        全ファイルの行数の合計で出力先の配列を1度だけ確保して書き込む。
+        確保した配列は書き込んだ分のみメモリを使い、書き込んだファイルの配列は
+        その都度解放するため、結合時のメモリ使用量は結果の約1倍となる。
     
-    # リストに溜まったDataFrameを結合する
-    if len(gsm_df_list) > 0:
-        
-        # リスト内のDataFrameを結合する
-        list_df = gsm_df_list[0].copy()
-        for i in range(1, len(gsm_df_list)):
-            list_df = list_df.append(gsm_df_list[i])
-    
-        # リストに登録していないDataFrameを結合する
-        if gsm_df is not None:
-            list_df = list_df.append(gsm_df)
+    Args:
+        file_paths(list[string])    : ファイルパスのリスト
+        read_file(function)         : 1ファイルを読み込む関数
+        executor_class(class)       : ThreadPoolExecutor or ProcessPoolExecutor
+        workers(int)                : ワーカー数
+
+    Returns:
+        DataFrame : ファイルの読込結果
+    """
+    if len(file_paths) == 0:
+        return None
+    
+    # ファイルごとに日付,時,物理量(列, 行),インデックスの配列に変換する
+    arrays = []
+    with executor_class(max_workers=workers) as executor:
+        for i, df in enumerate(executor.map(read_file, file_paths)):
+            
+            if i == 0:
+                columns = [col for col in df.columns if col not in ('日付', '時')]
             
-        gsm_df = list_df
+            # 列が一致しない場合はエラーとする
+            if (len(df.columns) != len(columns) + 2) or not set(columns).issubset(df.columns):
+                raise ValueError('columns of {0:s} do not match'.format(file_paths[i]))
+            
+            arrays.append((
+                df['日付'].values, df['時'].values,
+                np.ascontiguousarray(df[columns].values.T, dtype=np.float32), df.index.values))
+    
+    # 全ファイルの行数の合計で配列を確保する
+    num_rows = sum([len(dates) for dates, hours, file_values, index in arrays])
+    dates = np.empty(num_rows, dtype='datetime64[ns]')
+    hours = np.empty(num_rows, dtype=np.int64)
+    values = np.empty((len(columns), num_rows), dtype=np.float32)
+    
+    # 配列に書き込み、書き込んだファイルの配列は解放する
+    offset = 0
+    index = []
+    for i in range(len(arrays)):
+        file_dates, file_hours, file_values, file_index = arrays[i]
+        arrays[i] = None
+        num = len(file_dates)
+        dates[offset:offset + num] = file_dates
+        hours[offset:offset + num] = file_hours
+        values[:, offset:offset + num] = file_values
+        index.append(file_index)
+        offset += num
+        del file_values
+    
+    # DataFrameを作成する(物理量の配列は複写しない)
+    gsm_df = pd.DataFrame(values.T, columns=columns, index=np.concatenate(index), copy=False)
+    gsm_df.insert(0, '日付', dates)
+    gsm_df.insert(1, '時', hours)
     
     return gsm_df
+
+##################################################
+# GSMデータのCSVファイルを1つ読み込む
+##################################################
+def _read_gsm_csv(file_path):
+    
+    # 列名を取得し、型を指定して読み込む
+    #   日付: datetime64, 時: int64, 物理量: float32
+    columns = pd.read_csv(file_path, sep=',', nrows=0, index_col=0).columns
+    dtype = {col: np.float32 for col in columns if col not in ('日付', '時')}
+    dtype['時'] = np.int64
     
+    return pd.read_csv(file_path, sep=',', skiprows=0, header=0, index_col=0, 
+                        dtype=dtype, parse_dates=['日付'])
+
+##################################################
+# GSMデータのpickleファイルを1つ読み込む
+##################################################
+def _read_gsm_pickle(file_path):
+    return pd.read_pickle(file_path)
@@ -0,0 +1,304 @@
+# coding: utf-8
+
+import sys
+sys.path.append('../')
+import util
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+from gsm.schema import GsmColumnSchema
+
+# ストアの管理情報のファイル名
+__MANIFEST_FILENAME = 'manifest.pickle'
+
+##################################################
+# GSMデータのpickleファイルをストアに追加する
+##################################################
+def update_gsm_store(input_dir, store_dir):
+    """ GSMデータのpickleファイル(1日1ファイル)をストアに追加する
+
+        ストアは月単位のチャンクで構成し、チャンクごとに物理量(float32)を
+        列方向に連続した配列として保存する。
+        追加済みのファイルは読み込まず、新規・更新されたファイルのみを追加する。
+        削除・更新されたファイルが書き込んだ行(日付・時刻)は、追加の前にストアから除去する。
+
+    Args:
+        input_dir(string) : pickleファイルの格納ディレクトリ
+        store_dir(string) : ストアのディレクトリ
+
+    Returns:
+        int : 追加・更新・削除したファイル数
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest = _read_manifest(store_dir)
+
+    # ファイルごとに書き込んだ行が記録されていない場合は、ストアを作り直す
+    old_chunks = {}
+    if set(manifest['files'].keys()) != set(manifest['file_rows'].keys()):
+        old_chunks = dict(manifest['chunks'])
+        manifest = _new_manifest()
+
+    # 格納ディレクトリのファイル一覧と管理情報を比較し、
+    # 新規・更新されたファイルと削除されたファイルを取得する
+    input_files = {}
+    for file_path in util.get_file_paths(input_dir, '.pickle'):
+        stat = os.stat(file_path)
+        input_files[os.path.basename(file_path)] = (file_path, (stat.st_size, stat.st_mtime))
+
+    new_files = {
+        file_name: (file_path, file_state) for file_name, (file_path, file_state) in input_files.items()
+            if manifest['files'].get(file_name) != file_state
+    }
+    removed_files = [file_name for file_name in manifest['files'].keys() if file_name not in input_files]
+
+    if len(new_files) == 0 and len(removed_files) == 0 and len(old_chunks) == 0:
+        return 0
+
+    # 削除・更新されたファイルが書き込んだ行を、月単位に振り分ける
+    stale_rows = {}
+    for file_name in removed_files + [file_name for file_name in new_files if file_name in manifest['files']]:
+        for month, rows in manifest['file_rows'][file_name].items():
+            stale_rows.setdefault(month, []).append(rows)
+
+    # 新規・更新されたファイルを読み込み、月単位に振り分ける
+    month_dfs = {}
+    file_rows = {}
+    for file_name, (file_path, file_state) in new_files.items():
+
+        df = pd.read_pickle(file_path)
+
+        # 列の並びをストアに合わせる
+        columns = [col for col in df.columns if col not in ('日付', '時')]
+        if manifest['columns'] is None:
+            manifest['columns'] = columns
+        elif columns != manifest['columns']:
+            if set(columns) != set(manifest['columns']):
+                raise ValueError('columns of {0:s} do not match the store'.format(file_name))
+
+        file_rows[file_name] = {}
+        for month, month_df in df.groupby(df['日付'].dt.strftime('%Y_%m')):
+            month_dfs.setdefault(month, []).append(month_df)
+            file_rows[file_name][month] = (
+                month_df['日付'].values.astype('datetime64[ns]'), month_df['時'].values.astype(np.int64))
+
+    # 月単位のチャンクを更新する
+    removed_months = []
+    for month in sorted(set(month_dfs.keys()) | set(stale_rows.keys())):
+
+        if month in month_dfs:
+            df = pd.concat(month_dfs[month], ignore_index=True)
+            dates = df['日付'].values.astype('datetime64[ns]')
+            hours = df['時'].values.astype(np.int64)
+            values = df[manifest['columns']].values.astype(np.float32).T
+        else:
+            dates = np.empty(0, dtype='datetime64[ns]')
+            hours = np.empty(0, dtype=np.int64)
+            values = np.empty((len(manifest['columns']), 0), dtype=np.float32)
+
+        # 既存のチャンクに追加する
+        #   (削除・更新されたファイルの行と、同じ日付・時刻の行は置き換える)
+        if month in manifest['chunks']:
+            chunk_dates, chunk_hours, chunk_values = _read_chunk(store_dir, month, manifest)
+            remove_dates = [dates] + [rows[0] for rows in stale_rows.get(month, [])]
+            remove_hours = [hours] + [rows[1] for rows in stale_rows.get(month, [])]
+            keep = ~pd.MultiIndex.from_arrays([chunk_dates, chunk_hours]).isin(
+                        pd.MultiIndex.from_arrays([np.concatenate(remove_dates), np.concatenate(remove_hours)]))
+            dates = np.concatenate([chunk_dates[keep], dates])
+            hours = np.concatenate([chunk_hours[keep], hours])
+            values = np.concatenate([chunk_values[:, keep], values], axis=1)
+            old_chunks[month] = manifest['chunks'][month]
+            generation = manifest['chunks'][month] + 1
+        else:
+            generation = 0
+
+        # 行が無くなったチャンクは削除する
+        if dates.shape[0] == 0:
+            removed_months.append(month)
+            continue
+
+        # 日付・時刻の順に並べ替える
+        order = np.lexsort((hours, dates))
+        _write_chunk(store_dir, month, generation, dates[order], hours[order], values[:, order])
+        manifest['chunks'][month] = generation
+
+    # 管理情報を更新した後に、古い世代のチャンクを削除する
+    for month in removed_months:
+        manifest['chunks'].pop(month, None)
+    for file_name in removed_files:
+        del manifest['files'][file_name]
+        del manifest['file_rows'][file_name]
+    for file_name, (file_path, file_state) in new_files.items():
+        manifest['files'][file_name] = file_state
+        manifest['file_rows'][file_name] = file_rows[file_name]
+    _write_manifest(store_dir, manifest)
+    for month, generation in old_chunks.items():
+        if manifest['chunks'].get(month) == generation:
+            continue
+        for file_path in _get_chunk_paths(store_dir, month, generation):
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+    return len(new_files) + len(removed_files)
+
+##################################################
+# ストアからGSMデータを読み込む
+##################################################
+def load_gsm_store(store_dir, columns=None, layers=None, features=None,
+                    latitudes=None, longitudes=None, start_date=None, end_date=None):
+    """ ストアからGSMデータを読み込む
+
+        列(物理量・層・格子点)と日付の範囲を指定した場合は、
+        該当するチャンク・列のみを読み込む。
+        チャンクはメモリマップで開き、float32のまま出力先の配列に1度だけ複写する。
+
+    Args:
+        store_dir(string)   : ストアのディレクトリ
+        columns(list)       : 読み込む列名のリスト
+        layers(list)        : 読み込む層のリスト (ex) ['Surf', '850hPa']
+        features(list)      : 読み込む物理量のリスト (ex) ['気温', '相対湿度']
+        latitudes(tuple)    : 読み込む緯度の範囲 (ex) (35, 37)
+        longitudes(tuple)   : 読み込む経度の範囲 (ex) (138, 141)
+        start_date(string)  : 読み込む日付の開始 (ex) '2017-01-01'
+        end_date(string)    : 読み込む日付の終了(終了日を含む)
+
+    Returns:
+        DataFrame : 読み込み結果
+    """
+    manifest = _read_manifest(store_dir)
+    if manifest['columns'] is None:
+        return None
+
+    # 読み込む列を選択する
+    column_index = _select_columns(manifest['columns'], columns, layers, features, latitudes, longitudes)
+    selected_columns = [manifest['columns'][i] for i in column_index]
+
+    # 日付の範囲を取得する
+    start = np.datetime64(start_date, 'ns') if start_date is not None else None
+    end = np.datetime64(end_date, 'ns') if end_date is not None else None
+    start_month = str(start.astype('datetime64[M]')).replace('-', '_') if start is not None else None
+    end_month = str(end.astype('datetime64[M]')).replace('-', '_') if end is not None else None
+
+    # 日付の範囲に含まれるチャンクと行を選択する
+    chunks = []
+    num_rows = 0
+    for month in sorted(manifest['chunks'].keys()):
+
+        if (start_month is not None and month < start_month) or \
+           (end_month is not None and month > end_month):
+            continue
+
+        dates, hours, values = _read_chunk(store_dir, month, manifest)
+        rows = np.ones(dates.shape[0], dtype=bool)
+        if start is not None:
+            rows &= (dates >= start)
+        if end is not None:
+            rows &= (dates <= end)
+
+        chunks.append((dates, hours, values, rows))
+        num_rows += int(rows.sum())
+
+    # 出力先の配列(列方向に連続)を確保し、チャンクから複写する
+    out_dates = np.empty(num_rows, dtype='datetime64[ns]')
+    out_hours = np.empty(num_rows, dtype=np.int64)
+    out_values = np.empty((len(column_index), num_rows), dtype=np.float32)
+    offset = 0
+    for dates, hours, values, rows in chunks:
+        n = int(rows.sum())
+        out_dates[offset:offset + n] = dates[rows]
+        out_hours[offset:offset + n] = hours[rows]
+        if n == rows.shape[0]:
+            out_values[:, offset:offset + n] = values[column_index]
+        else:
+            out_values[:, offset:offset + n] = values[column_index][:, rows]
+        offset += n
+
+    # DataFrameを作成する(物理量の配列は複写しない)
+    gsm_df = pd.DataFrame(out_values.T, columns=selected_columns, copy=False)
+    gsm_df.insert(0, '日付', out_dates)
+    gsm_df.insert(1, '時', out_hours)
+
+    return gsm_df
+
+##################################################
+# 読み込む列のインデックスを選択する
+##################################################
+def _select_columns(all_columns, columns, layers, features, latitudes, longitudes):
+
+    if (layers is None) and (features is None) and (latitudes is None) and (longitudes is None):
+        selected = all_columns
+    else:
+        # 列スキーマから層,緯度,経度,物理量の条件に一致する列を取得する
+        #   (ex)'850hPa_lat38.00_long135.000_気温'
+        schema = GsmColumnSchema(all_columns)
+        selected = schema.select(layers, features, latitudes, longitudes)
+
+    if columns is not None:
+        column_set = set(columns)
+        selected = [column for column in selected if column in column_set]
+
+    # 列名 -> インデックス
+    index = {column: i for i, column in enumerate(all_columns)}
+
+    return np.array([index[column] for column in selected], dtype=np.int64)
+
+##################################################
+# チャンクのファイルパスを取得する
+##################################################
+def _get_chunk_paths(store_dir, month, generation):
+    return [
+        os.path.join(store_dir, '{0:s}.{1:d}.{2:s}.npy'.format(month, generation, name))
+            for name in ('dates', 'hours', 'values')
+    ]
+
+##################################################
+# チャンクを読み込む(物理量はメモリマップで開く)
+##################################################
+def _read_chunk(store_dir, month, manifest):
+    dates_path, hours_path, values_path = _get_chunk_paths(store_dir, month, manifest['chunks'][month])
+    dates = np.load(dates_path)
+    hours = np.load(hours_path)
+    values = np.load(values_path, mmap_mode='r')
+    return dates, hours, values
+
+##################################################
+# チャンクを書き込む
+##################################################
+def _write_chunk(store_dir, month, generation, dates, hours, values):
+    for file_path, array in zip(_get_chunk_paths(store_dir, month, generation), (dates, hours, values)):
+        temp_path = '{0:s}.tmp.npy'.format(file_path)
+        np.save(temp_path, np.ascontiguousarray(array))
+        os.replace(temp_path, file_path)
+
+##################################################
+# ストアの管理情報を読み込む
+##################################################
+def _read_manifest(store_dir):
+    manifest_path = os.path.join(store_dir, __MANIFEST_FILENAME)
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, 'rb') as f:
+            manifest = pickle.load(f)
+        manifest.setdefault('file_rows', {})
+        return manifest
+
+    return _new_manifest()
+
+##################################################
+# 空のストアの管理情報を作成する
+##################################################
+def _new_manifest():
+    # 列名, 月ごとのチャンクの世代, 追加済みファイルの状態(サイズ,更新時刻),
+    # 追加済みファイルが書き込んだ月ごとの行(日付,時刻)
+    return {'columns': None, 'chunks': {}, 'files': {}, 'file_rows': {}}
+
+##################################################
+# ストアの管理情報を書き込む
+##################################################
+def _write_manifest(store_dir, manifest):
+    manifest_path = os.path.join(store_dir, __MANIFEST_FILENAME)
+    temp_path = '{0:s}.tmp'.format(manifest_path)
+    with open(temp_path, 'wb') as f:
+        pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, manifest_path)
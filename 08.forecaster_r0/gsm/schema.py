@@ -0,0 +1,228 @@
+# coding: utf-8
+
+import re
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# 格子点データの列名のパターン
+#   (ex)'850hPa_lat38.00_long135.000_気温'
+_GRID_COLUMN_PATTERN = re.compile(r"^(.*)_lat(\d+\.\d+)_long(\d+\.\d+)_(.*)$")
+
+# 指定気圧面の層の名称のパターン
+#   (ex)'850hPa'
+_PRESSURE_LAYER_PATTERN = re.compile(r"^(\d+)hPa$")
+
+# 列名の並び -> 列スキーマのキャッシュ
+#   (DataFrame.attrsに保持するとpickleに含まれるため、モジュール内に保持する)
+_schema_cache = OrderedDict()
+_SCHEMA_CACHE_SIZE = 16
+
+# 解析済みの列名 -> (層, 緯度, 経度, 物理量)
+_parsed_columns = {}
+
+##################################################
+# GSMデータの列スキーマ
+##################################################
+class GsmColumnSchema:
+    """ GSMデータの列スキーマ
+
+        列名を1回だけ解析し、(層, 緯度, 経度, 物理量)に分解して保持する。
+        格子点以外の列(日付,時等)の解析結果はNoneとする。
+
+    Attributes:
+        columns (Index)             : 列名
+        grid_columns (list[string]) : 格子点の列名
+        other_columns (list[string]): 格子点以外の列名
+    """
+
+    ##################################################
+    # コンストラクタ
+    ##################################################
+    def __init__(self, columns, known=None):
+        """ コンストラクタ
+
+        Args:
+            columns(list[string])   : 列名
+            known(dict)             : 解析済みの列名 -> (層, 緯度, 経度, 物理量)
+        """
+        self.columns = pd.Index(columns)
+
+        # 列名を解析する(解析済みの列名は解析しない)
+        self._parsed = {}
+        for column in self.columns:
+            if (known is not None) and (column in known):
+                self._parsed[column] = known[column]
+            else:
+                result = _GRID_COLUMN_PATTERN.search(column)
+                self._parsed[column] = result.groups() if result else None
+
+        # 格子点の列の層,緯度,経度,物理量
+        self.grid_columns = [column for column in self.columns if self._parsed[column] is not None]
+        self.other_columns = [column for column in self.columns if self._parsed[column] is None]
+        parts = [self._parsed[column] for column in self.grid_columns]
+        self._layers = np.array([p[0] for p in parts], dtype=object)
+        self._latitudes = np.array([p[1] for p in parts], dtype=object)
+        self._longitudes = np.array([p[2] for p in parts], dtype=object)
+        self._features = np.array([p[3] for p in parts], dtype=object)
+        self._latitude_values = self._latitudes.astype(np.float64)
+        self._longitude_values = self._longitudes.astype(np.float64)
+
+        # 一覧のキャッシュ
+        self._unique_cache = {}
+
+    ##################################################
+    # 列名の解析結果を取得する
+    ##################################################
+    def parse(self, column):
+        """ 列名の解析結果を取得する
+
+        Args:
+            column(string) : 列名
+
+        Returns:
+            tuple : (層, 緯度, 経度, 物理量) 格子点以外の列はNone
+        """
+        return self._parsed[column]
+
+    ##################################################
+    # 列スキーマがDataFrameの列と一致するか否か
+    ##################################################
+    def matches(self, columns):
+        return self.columns.equals(pd.Index(columns))
+
+    ##################################################
+    # 緯度の一覧
+    ##################################################
+    def latitudes(self, layers=None):
+        """ 緯度の一覧(列名の表記のまま,出現順)を取得する
+
+        Args:
+            layers(list[string]) : 対象の層 (ex) ['Surf'] Noneの場合は全ての層
+
+        Returns:
+            list[string] : 緯度のリスト
+        """
+        return self._unique('latitudes', self._latitudes, layers)
+
+    ##################################################
+    # 経度の一覧
+    ##################################################
+    def longitudes(self, layers=None):
+        """ 経度の一覧(列名の表記のまま,出現順)を取得する
+
+        Args:
+            layers(list[string]) : 対象の層 (ex) ['Surf'] Noneの場合は全ての層
+
+        Returns:
+            list[string] : 経度のリスト
+        """
+        return self._unique('longitudes', self._longitudes, layers)
+
+    ##################################################
+    # 物理量の一覧
+    ##################################################
+    def features(self, layers=None):
+        """ 物理量の一覧(出現順)を取得する
+
+        Args:
+            layers(list[string]) : 対象の層 Noneの場合は全ての層
+
+        Returns:
+            list[string] : 物理量のリスト
+        """
+        return self._unique('features', self._features, layers)
+
+    ##################################################
+    # 層の一覧
+    ##################################################
+    @property
+    def layers(self):
+        return self._unique('layers', self._layers, None)
+
+    ##################################################
+    # 指定気圧面の層の一覧
+    ##################################################
+    @property
+    def pressure_layers(self):
+        return [layer for layer in self.layers if _PRESSURE_LAYER_PATTERN.search(layer)]
+
+    ##################################################
+    # 条件に一致する格子点の列名を取得する
+    ##################################################
+    def select(self, layers=None, features=None, latitudes=None, longitudes=None):
+        """ 条件に一致する格子点の列名を取得する(元の並び順)
+
+        Args:
+            layers(list[string])    : 層のリスト
+            features(list[string])  : 物理量のリスト
+            latitudes(tuple)        : 緯度の範囲 (ex) (35, 37)
+            longitudes(tuple)       : 経度の範囲 (ex) (138, 141)
+
+        Returns:
+            list[string] : 列名のリスト
+        """
+        mask = np.ones(len(self.grid_columns), dtype=bool)
+        if layers is not None:
+            mask &= np.isin(self._layers, list(layers))
+        if features is not None:
+            mask &= np.isin(self._features, list(features))
+        if latitudes is not None:
+            mask &= (latitudes[0] <= self._latitude_values) & (self._latitude_values <= latitudes[1])
+        if longitudes is not None:
+            mask &= (longitudes[0] <= self._longitude_values) & (self._longitude_values <= longitudes[1])
+
+        return [self.grid_columns[i] for i in np.flatnonzero(mask)]
+
+    ##################################################
+    # 出現順の一覧を取得する
+    ##################################################
+    def _unique(self, name, values, layers):
+        cache_key = (name, None if layers is None else tuple(layers))
+        if cache_key not in self._unique_cache:
+            if layers is not None:
+                values = values[np.isin(self._layers, list(layers))]
+            self._unique_cache[cache_key] = list(dict.fromkeys(values))
+        return self._unique_cache[cache_key]
+
+##################################################
+# DataFrameの列スキーマを取得する
+##################################################
+def get_column_schema(df):
+    """ DataFrameの列スキーマを取得する
+
+        列の並びが同じ列スキーマをキャッシュから取得する。
+        無い場合は、解析済みの列名を再利用して列スキーマを作成する。
+
+    Args:
+        df(DataFrame) : GSMデータ
+
+    Returns:
+        GsmColumnSchema : 列スキーマ
+    """
+    key = tuple(df.columns)
+    schema = _schema_cache.get(key)
+    if schema is not None:
+        _schema_cache.move_to_end(key)
+        return schema
+
+    schema = GsmColumnSchema(df.columns, known=_parsed_columns)
+    set_column_schema(df, schema)
+    return schema
+
+##################################################
+# DataFrameに列スキーマを設定する
+##################################################
+def set_column_schema(df, schema):
+    """ DataFrameに列スキーマを設定する
+        (DataFrame自体には保持せず、列の並びをキーにキャッシュする)
+
+    Args:
+        df(DataFrame)           : GSMデータ
+        schema(GsmColumnSchema) : 列スキーマ
+    """
+    _parsed_columns.update(schema._parsed)
+    _schema_cache[tuple(df.columns)] = schema
+    _schema_cache.move_to_end(tuple(df.columns))
+    while len(_schema_cache) > _SCHEMA_CACHE_SIZE:
+        _schema_cache.popitem(last=False)
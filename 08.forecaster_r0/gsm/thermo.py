@@ -0,0 +1,167 @@
+# coding: utf-8
+
+import numpy as np
+
+# 0℃の絶対温度[K]
+__ZERO_DEGC = 273.15
+
+# 0℃の飽和水蒸気圧[hPa]
+__SAT_PRESSURE_0C = 6.112
+
+# 水蒸気と乾燥空気の分子量の比
+__EPSILON = 0.6219569
+
+# 乾燥空気の気体定数と定圧比熱の比(Rd/Cp)
+__KAPPA = 0.2857
+
+##################################################
+# 相対湿度から水蒸気圧を計算する
+##################################################
+def vapor_pressure_from_relative_humidity(temperature, relative_humidity):
+    """ 相対湿度から水蒸気圧を計算する
+        (飽和水蒸気圧はBoltonの式で計算する)
+
+    Args:
+        temperature(ndarray)        : 気温[K]
+        relative_humidity(ndarray)  : 相対湿度[%]
+
+    Returns:
+        ndarray : 水蒸気圧[hPa]
+    """
+    temperature, relative_humidity = _as_float_arrays(temperature, relative_humidity)
+    return relative_humidity / 100 * _saturation_vapor_pressure(temperature)
+
+##################################################
+# 水蒸気圧から露点温度を計算する
+##################################################
+def dewpoint_from_vapor_pressure(vapor_pressure):
+    """ 水蒸気圧から露点温度を計算する
+        (Boltonの飽和水蒸気圧の式の逆関数)
+
+    Args:
+        vapor_pressure(ndarray) : 水蒸気圧[hPa]
+
+    Returns:
+        ndarray : 露点温度[K]
+    """
+    vapor_pressure, = _as_float_arrays(vapor_pressure)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        val = np.log(vapor_pressure / __SAT_PRESSURE_0C)
+        dewpoint = __ZERO_DEGC + 243.5 * val / (17.67 - val)
+
+    return dewpoint.astype(vapor_pressure.dtype, copy=False)
+
+##################################################
+# 気温と相対湿度から露点温度を計算する
+##################################################
+def dewpoint_from_relative_humidity(temperature, relative_humidity):
+    """ 気温と相対湿度から露点温度を計算する
+
+    Args:
+        temperature(ndarray)        : 気温[K]
+        relative_humidity(ndarray)  : 相対湿度[%]
+
+    Returns:
+        ndarray : 露点温度[K]
+    """
+    vapor_pressure = vapor_pressure_from_relative_humidity(temperature, relative_humidity)
+    return dewpoint_from_vapor_pressure(vapor_pressure)
+
+##################################################
+# 気温と相対湿度から湿数を計算する
+##################################################
+def moisture_from_relative_humidity(temperature, relative_humidity):
+    """ 気温と相対湿度から湿数(気温 - 露点温度)を計算する
+
+    Args:
+        temperature(ndarray)        : 気温[K]
+        relative_humidity(ndarray)  : 相対湿度[%]
+
+    Returns:
+        ndarray : 湿数[K]
+    """
+    temperature, relative_humidity = _as_float_arrays(temperature, relative_humidity)
+    return temperature - dewpoint_from_relative_humidity(temperature, relative_humidity)
+
+##################################################
+# 相当温位を計算する
+##################################################
+def equivalent_potential_temperature(pressure, temperature, dewpoint):
+    """ 相当温位を計算する (Boltonの式)
+
+        T_L = 1 / (1 / (Td - 56) + ln(T / Td) / 800) + 56
+        θ_L = T * (1000 / (p - e))^κ * (T / T_L)^(0.28 * r)
+        θe  = θ_L * exp((3036 / T_L - 1.78) * r * (1 + 0.448 * r))
+
+    Args:
+        pressure(ndarray)       : 気圧[hPa]
+        temperature(ndarray)    : 気温[K]
+        dewpoint(ndarray)       : 露点温度[K]
+
+    Returns:
+        ndarray : 相当温位[K]
+    """
+    pressure, temperature, dewpoint = _as_float_arrays(pressure, temperature, dewpoint)
+
+    # 水蒸気圧(露点温度の飽和水蒸気圧)と混合比
+    vapor_pressure = _saturation_vapor_pressure(dewpoint)
+    mixing_ratio = __EPSILON * vapor_pressure / (pressure - vapor_pressure)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # 持ち上げ凝結高度の気温
+        t_l = 56 + 1 / (1 / (dewpoint - 56) + np.log(temperature / dewpoint) / 800)
+
+        # 持ち上げ凝結高度の温位
+        th_l = temperature * (1000 / (pressure - vapor_pressure)) ** __KAPPA \
+                * (temperature / t_l) ** (0.28 * mixing_ratio)
+
+        ept = th_l * np.exp((3036 / t_l - 1.78) * mixing_ratio * (1 + 0.448 * mixing_ratio))
+
+    return ept.astype(temperature.dtype, copy=False)
+
+##################################################
+# 湿数と相当温位をまとめて計算する
+##################################################
+def moisture_and_equivalent_potential_temperature(pressure, temperature, relative_humidity):
+    """ 湿数と相当温位をまとめて計算する
+        (露点温度の計算は1回のみ行う)
+
+    Args:
+        pressure(ndarray)           : 気圧[hPa]
+        temperature(ndarray)        : 気温[K]
+        relative_humidity(ndarray)  : 相対湿度[%]
+
+    Returns:
+        ndarray : 湿数[K]
+        ndarray : 相当温位[K]
+    """
+    temperature, relative_humidity = _as_float_arrays(temperature, relative_humidity)
+
+    dewpoint = dewpoint_from_relative_humidity(temperature, relative_humidity)
+    moisture = temperature - dewpoint
+    ept = equivalent_potential_temperature(pressure, temperature, dewpoint)
+
+    return moisture, ept
+
+##################################################
+# 飽和水蒸気圧を計算する
+##################################################
+def _saturation_vapor_pressure(temperature):
+    """ 飽和水蒸気圧[hPa]を計算する (Boltonの式)
+        es = 6.112 * exp(17.67 * T / (T + 243.5))  (T:℃)
+    """
+    celsius = temperature - __ZERO_DEGC
+    return __SAT_PRESSURE_0C * np.exp(17.67 * celsius / (celsius + 243.5))
+
+##################################################
+# 計算用の浮動小数点数のndarrayに変換する
+##################################################
+def _as_float_arrays(*arrays):
+    """ 計算用の浮動小数点数のndarrayに変換する
+        (float32の入力はfloat32のまま計算する。スカラーは型の決定に含めない)
+    """
+    arrays = [np.asarray(array) for array in arrays]
+    dtype = np.result_type(*[array.dtype for array in arrays if array.ndim > 0], np.float32)
+    return [array.astype(dtype, copy=False) for array in arrays]
@@ -117,17 +117,17 @@ class GsmLoader2020Ver1(AbsLoader):
         
         # 保存ファイルの有無を確認する
         os.makedirs(self._temp_dir, exist_ok=True)
-        ground_weather_csv = os.path.join(self._temp_dir, 'ground_weather.csv')
-        exist_csv = os.path.isfile(ground_weather_csv)
+        ground_weather_dir = os.path.join(self._temp_dir, 'ground_weather_typed')
+        exist_cache = util.exists_typed_frame(ground_weather_dir)
         
-        if (reload == False) and (exist_csv == True):
+        if (reload == False) and (exist_cache == True):
             # 読み込み済み、かつ、リロード無しの場合は、
             # 保存したファイルを読み込む
-            ground_df = pd.read_csv(ground_weather_csv, index_col=0, parse_dates=[1])
+            ground_df = util.load_typed_frame(ground_weather_dir)
         else:
             ground_dir = os.path.join(self._input2_dir, 'ground_weather')
             ground_df = wfile.get_ground_weather(ground_dir)
-            ground_df.to_csv(ground_weather_csv)
+            util.save_typed_frame(ground_df, ground_weather_dir)
         
         # 3時,9時,15時,21時のデータを抽出する
         ground_df = util.extract_row_isin(ground_df, '時', [3, 9, 15, 21])
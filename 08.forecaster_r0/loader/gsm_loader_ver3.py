@@ -27,7 +27,7 @@ class GsmLoader2020Ver3(AbsLoader):
     # コンストラクタ
     ##################################################
     def __init__(self, base_dir, temp_dirname, input_dirname, label_name, input2_dirname, 
-                    thinout_interval, weather_convert_mode):
+                    thinout_interval, weather_convert_mode, cache_max_bytes=8*1024**3):
         
         # 抽象クラスのコンストラクタ
         super().__init__(base_dir, temp_dirname, input_dirname, label_name)
@@ -38,17 +38,22 @@ class GsmLoader2020Ver3(AbsLoader):
         self._thinout_interval = thinout_interval
         self._weather_convert_mode = weather_convert_mode
         
+        # 処理段階ごとのキャッシュ
+        self._stage_cache = util.StageCache(
+            os.path.join(self._temp_dir, 'stage_cache'), max_bytes=cache_max_bytes)
+        
     ##################################################
     # データをロードする
     ##################################################
     def load(self, reload=False):
         
-        # GSMデータをロードする
-        gsm_df = self._load_gsm_weather(reload)
+        # GSMデータをロードし、前処理を施す(処理段階ごとにキャッシュする)
+        gsm_df = self._load_gsm_weather_with_cache(reload)
+        #gsm_df = self._load_gsm_weather(reload)
         #gsm_df = self._load_gsm_weather_for_concat(reload)
         
         # GSMデータに前処理を施す
-        gsm_df = self._process_gsm_weather(gsm_df)
+        #gsm_df = self._process_gsm_weather(gsm_df)
         print(gsm_df.info())
         
         # 地上気象データをロードする
@@ -77,7 +82,12 @@ class GsmLoader2020Ver3(AbsLoader):
             gsm_df = pd.read_pickle(gsm_pickle)
         else:
             #gsm_df = gsm.load_gsm_pickle(self._input_dir)
-            gsm_df = gsm.load_gsm_pickle_one_dir(self._input_dir)
+            #gsm_df = gsm.load_gsm_pickle_one_dir(self._input_dir)
+            
+            # GSMデータのpickleファイルをストアに追加し、ストアから読み込む
+            gsm_store_dir = os.path.join(self._temp_dir, 'gsm_store')
+            gsm.update_gsm_store(self._input_dir, gsm_store_dir)
+            gsm_df = gsm.load_gsm_store(gsm_store_dir)
             
             # GSMデータを指定した間隔で間引く
             #gsm_df = gsm.thin_out_gsm(gsm_df, interval=self._thinout_interval)
@@ -87,35 +97,159 @@ class GsmLoader2020Ver3(AbsLoader):
             
         return gsm_df
         
+    ##################################################
+    # GSMデータを読み込み、前処理を施す(処理段階ごとにキャッシュする)
+    ##################################################
+    def _load_gsm_weather_with_cache(self, reload):
+        
+        cache = self._stage_cache
+        
+        # 処理段階ごとのコードのバージョンとパラメータ
+        raw_version = util.get_code_version(gsm.gsm_read, gsm.gsm_store)
+        thinned_version = util.get_code_version(gsm.thin_out_gsm_with_interpolation, gsm.grid, gsm.schema)
+        features_version = util.get_code_version(
+            self._process_gsm_weather, gsm.processing, gsm.thermo, gsm.grid, gsm.schema, wdfproc.drop)
+        thinned_params = {'interval': tuple(self._thinout_interval)}
+        
+        # 入力ファイルの状態, パラメータ, コードのバージョンから処理段階ごとのキーを作成する
+        #   raw      : ストアから読み込んだデータ
+        #   thinned  : 指定した間隔で間引いたデータ
+        #   features : 前処理を施したデータ
+        input_files = util.get_file_paths(self._input_dir, '.pickle')
+        fingerprint = util.get_files_fingerprint(input_files)
+        raw_key = cache.make_key('raw', fingerprint, {}, raw_version)
+        thinned_key = cache.make_key('thinned', raw_key, thinned_params, thinned_version)
+        features_key = cache.make_key('features', thinned_key, {}, features_version)
+        
+        # 最新の前処理済みデータのキーと入力ファイルの状態を保存するキー
+        #   (入力ファイルに依存しないキー)
+        latest_key = cache.make_key(
+            'features_latest', None, thinned_params, (raw_version, thinned_version, features_version))
+        latest = {'key': features_key, 'files': {path: (size, mtime) for path, size, mtime in fingerprint}}
+        
+        # リロード無しの場合は、後段のキャッシュから順に探す
+        if reload == False:
+            gsm_df = cache.load(features_key)
+            if gsm_df is not None:
+                return self._process_gsm_weather_series(gsm_df)
+            
+            # 前回の前処理済みデータに、新規・更新された日のデータのみを追加する
+            gsm_df = self._append_gsm_weather(cache.load(latest_key), latest['files'])
+            if gsm_df is not None:
+                cache.save(features_key, gsm_df)
+                cache.save(latest_key, latest)
+                return self._process_gsm_weather_series(gsm_df)
+            
+            gsm_df = cache.load(thinned_key)
+        else:
+            gsm_df = None
+        
+        if gsm_df is None:
+            
+            if reload == False:
+                gsm_df = cache.load(raw_key)
+            
+            if gsm_df is None:
+                # GSMデータのpickleファイルをストアに追加し、ストアから読み込む
+                gsm_store_dir = os.path.join(self._temp_dir, 'gsm_store')
+                gsm.update_gsm_store(self._input_dir, gsm_store_dir)
+                gsm_df = gsm.load_gsm_store(gsm_store_dir)
+                cache.save(raw_key, gsm_df)
+            
+            # GSMデータを指定した間隔で間引く
+            gsm_df = gsm.thin_out_gsm_with_interpolation(gsm_df, interval=self._thinout_interval)
+            cache.save(thinned_key, gsm_df)
+        
+        # GSMデータに前処理を施す
+        gsm_df = self._process_gsm_weather(gsm_df)
+        cache.save(features_key, gsm_df)
+        cache.save(latest_key, latest)
+        
+        # 行をまたぐ前処理は全ての行に対して施す(キャッシュしない)
+        return self._process_gsm_weather_series(gsm_df)
+        
+    ##################################################
+    # 前処理済みのGSMデータに新規・更新された日のデータを追加する
+    ##################################################
+    def _append_gsm_weather(self, latest, files):
+        """ 前処理済みのGSMデータに新規・更新された日のデータを追加する
+            (新規・更新されたファイルのみ間引き,前処理を施す)
+            
+            新規・更新された日のデータには単独で_process_gsm_weatherを施すため、
+            _process_gsm_weatherは1行の中で完結する前処理のみとする。
+            行をまたぐ前処理(時間変化量,ラグ特徴量,月平均との差分)は
+            追加後の全ての行に対して_process_gsm_weather_seriesで施す。
+        
+        Args:
+            latest(dict)    : 前回の前処理済みデータのキーと入力ファイルの状態
+            files(dict)     : 入力ファイルの状態 ファイルパス -> (サイズ, 更新日時)
+        
+        Returns:
+            DataFrame : 追加後のGSMデータ(追加できない場合はNone)
+        """
+        if latest is None:
+            return None
+        
+        # 削除されたファイルがある場合は追加できない
+        if len(set(latest['files'].keys()) - set(files.keys())) > 0:
+            return None
+        
+        gsm_df = self._stage_cache.load(latest['key'])
+        if gsm_df is None:
+            return None
+        
+        # 新規・更新されたファイルを読み込み、間引き,前処理を施す
+        new_files = [path for path, state in files.items() if latest['files'].get(path) != state]
+        if len(new_files) == 0:
+            return gsm_df
+        new_df = gsm.load_gsm_pickle_files(sorted(new_files))
+        new_df = gsm.thin_out_gsm_with_interpolation(new_df, interval=self._thinout_interval)
+        new_df = self._process_gsm_weather(new_df)
+        
+        # 列が一致しない場合は追加できない
+        if set(new_df.columns) != set(gsm_df.columns):
+            return None
+        
+        # 同じ日付・時刻の行を置き換え、日付・時刻の順に並べる
+        keep = ~pd.MultiIndex.from_frame(gsm_df[['日付', '時']]).isin(
+                    pd.MultiIndex.from_frame(new_df[['日付', '時']]))
+        gsm_df = pd.concat([gsm_df[keep], new_df[gsm_df.columns]], ignore_index=True)
+        gsm_df = gsm_df.sort_values(['日付', '時'], kind='mergesort').reset_index(drop=True)
+        
+        return gsm_df
+        
     ##################################################
     # GSMデータに前処理を施す
     ##################################################
     def _process_gsm_weather(self, gsm_df):
+        """ GSMデータに前処理を施す
+            (新規・更新された日のデータのみに施す場合があるため、1行の中で完結する前処理のみとする)
+        """
         
         # 地表と指定気圧面の差を追加する
         #gsm_df = gsm.add_difference_surface_and_pall(gsm_df)
         
-        # 時間変化量を追加する
-        #gsm_df = util.add_time_variation(gsm_df)
-        
-        # 月平均との差分を追加する
-        #gsm_df = util.add_difference_monthly_mean(gsm_df, ['気温', '高度'])
-        
         # 指定した緯度,経度のデータを抽出する
         #   静岡〜いわき (35,138.8)〜(36.6,140.7)
         #gsm_df = gsm.extract_latitude_and_longitude(gsm_df, latitudes=(35,37), longitudes=(138, 141))
         
+        # 格子データに変換し、特徴量の追加は格子データ上で行う
+        gsm_grid = gsm.GsmGrid.from_dataframe(gsm_df)
+        
         # 指定気圧面の湿数を追加する
-        gsm_df = gsm.add_moisture(gsm_df)
+        gsm_grid = gsm.add_moisture(gsm_grid)
         
         # 指定気圧面の相当温位を追加する
-        gsm_df = gsm.add_potential_temperature(gsm_df)
+        gsm_grid = gsm.add_potential_temperature(gsm_grid)
         
         # 指定気圧面のジオポテンシャル高度偏差を追加する
-        gsm_df = gsm.add_height_diviation(gsm_df)
+        gsm_grid = gsm.add_height_diviation(gsm_grid)
         
         # 相当温位の指定気圧面と地上の差を追加する
-        gsm_df = gsm.add_difference_surface_and_pall(gsm_df, ['相当温位'])
+        gsm_grid = gsm.add_difference_surface_and_pall(gsm_grid, ['相当温位'])
+        
+        # 追加した特徴量を含めて1回でDataFrameに戻す
+        gsm_df = gsm_grid.to_dataframe()
         
         # 不要な列を削る
         drop_columns = [
@@ -133,24 +267,34 @@ class GsmLoader2020Ver3(AbsLoader):
         
         return gsm_df
     
+    ##################################################
+    # GSMデータに行をまたぐ前処理を施す
+    ##################################################
+    def _process_gsm_weather_series(self, gsm_df):
+        """ GSMデータに行をまたぐ前処理を施す
+            (前後の行や月全体の値を使うため、差分追加後の全ての行に対して施す)
+        """
+        
+        # 時間変化量を追加する
+        #gsm_df = util.add_time_variation(gsm_df)
+        #gsm_df = util.add_lag_features(gsm_df, diff_steps=[1, 4], rolling_windows=[4])
+        
+        # 月平均との差分を追加する
+        #gsm_df = util.add_difference_monthly_mean(gsm_df, ['気温', '高度'])
+        
+        return gsm_df
+    
     ##################################################
     # 地上気象データを読み込む
     ##################################################
     def _load_ground_weather(self, reload):
         
-        # 保存ファイルの有無を確認する
+        # 地上気象データを読み込む
+        #   地点ごとに読み込み済みのデータを保存し、新規・更新されたファイルのみを追加する
         os.makedirs(self._temp_dir, exist_ok=True)
-        ground_weather_csv = os.path.join(self._temp_dir, 'ground_weather.csv')
-        exist_csv = os.path.isfile(ground_weather_csv)
-        
-        if (reload == False) and (exist_csv == True):
-            # 読み込み済み、かつ、リロード無しの場合は、
-            # 保存したファイルを読み込む
-            ground_df = pd.read_csv(ground_weather_csv, index_col=0, parse_dates=[1])
-        else:
-            ground_dir = os.path.join(self._input2_dir, 'ground_weather')
-            ground_df = wfile.get_ground_weather(ground_dir)
-            ground_df.to_csv(ground_weather_csv)
+        ground_dir = os.path.join(self._input2_dir, 'ground_weather')
+        ground_df = wfile.update_ground_weather(
+            ground_dir, os.path.join(self._temp_dir, 'ground_weather'), reload)
         
         # 3時,9時,15時,21時のデータを抽出する
         ground_df = util.extract_row_isin(ground_df, '時', [3, 9, 15, 21])
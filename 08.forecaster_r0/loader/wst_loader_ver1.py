@@ -63,18 +63,11 @@ class WeatherStationLoader2020Ver1(AbsLoader):
     ##################################################
     def _load_ground_weather(self, reload):
         
-        # 保存ファイルの有無を確認する
-        ground_weather_csv = os.path.join(self._temp_dir, 'ground_weather.csv')
-        exist_csv = os.path.isfile(ground_weather_csv)
-        
-        if (reload == False) and (exist_csv == True):
-            # 読み込み済み、かつ、リロード無しの場合は、
-            # 保存したファイルを読み込む
-            ground_df = pd.read_csv(ground_weather_csv, index_col=0, parse_dates=[1])
-        else:
-            ground_dir = os.path.join(self._input_dir, 'ground_weather')
-            ground_df = wfile.get_ground_weather(ground_dir)
-            ground_df.to_csv(ground_weather_csv)
+        # 地上気象データを読み込む
+        #   地点ごとに読み込み済みのデータを保存し、新規・更新されたファイルのみを追加する
+        ground_dir = os.path.join(self._input_dir, 'ground_weather')
+        ground_df = wfile.update_ground_weather(
+            ground_dir, os.path.join(self._temp_dir, 'ground_weather'), reload)
         
         return ground_df
         
@@ -129,17 +122,17 @@ class WeatherStationLoader2020Ver1(AbsLoader):
     def _load_highrise_weather(self, reload):
         
         # 保存ファイルの有無を確認する
-        highrise_weather_csv = os.path.join(self._temp_dir, 'highrise_weather.csv')
-        exist_csv = os.path.isfile(highrise_weather_csv)
+        highrise_weather_dir = os.path.join(self._temp_dir, 'highrise_weather_typed')
+        exist_cache = util.exists_typed_frame(highrise_weather_dir)
         
-        if (reload == False) and (exist_csv == True):
+        if (reload == False) and (exist_cache == True):
             # 読み込み済み、かつ、リロード無しの場合は、
             # 保存したファイルを読み込む
-            highrise_df = pd.read_csv(highrise_weather_csv, index_col=0, parse_dates=[1])
+            highrise_df = util.load_typed_frame(highrise_weather_dir)
         else:
             highrise_dir = os.path.join(self._input_dir, 'highrise_weather')
             highrise_df = wfile.get_highrise_weather(highrise_dir)
-            highrise_df.to_csv(highrise_weather_csv)
+            util.save_typed_frame(highrise_df, highrise_weather_dir)
         
         return highrise_df
         
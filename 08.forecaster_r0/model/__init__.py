@@ -1,3 +1,4 @@
 from model.model_dnn import *
 from model.model_gbdt import *
 from model.model_random_forest import *
+from model.xgb_dataset import *
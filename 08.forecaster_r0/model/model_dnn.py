@@ -4,6 +4,7 @@ from .abs_model import AbsModel
 
 import os
 import numpy as np
+import tensorflow as tf
 import keras
 from keras import optimizers
 from keras.models import Sequential, load_model
@@ -11,6 +12,8 @@ from keras.layers import Dense, Activation, Dropout, LeakyReLU
 from sklearn.model_selection import train_test_split
 #import matplotlib.pyplot as plt
 
+import util
+
 ##################################################
 # DNN
 ##################################################
@@ -41,6 +44,9 @@ class ModelDnn(AbsModel):
         
         self._model = None
         
+        # 入力の標準化に使用したスケーラ(モデルと一緒に保存する)
+        self._scaler = None
+        
     ##################################################
     # モデル作成
     ##################################################
@@ -70,10 +76,10 @@ class ModelDnn(AbsModel):
         
         # 最適化アルゴリズムを設定する
         #optimizer = optimizers.SGD(lr=learning_rate)
-        optimizer = optimizers.Adam(lr=learning_rate)
+        optimizer = optimizers.Adam(learning_rate=learning_rate)
         model.compile(
             optimizer=optimizer,
-            loss='categorical_crossentropy',
+            loss='sparse_categorical_crossentropy',
             metrics=['accuracy'])
         
         self._model = model
@@ -98,19 +104,20 @@ class ModelDnn(AbsModel):
         batch_size = self._params['batch_size']
         early_stopping_patience = self._params['early_stopping_patience']
         
-        # ラベルをOne-Hot Labelに変換する
-        label_num = self._params['label_num']
-        train_y_onehot = keras.utils.to_categorical(train_y, num_classes=label_num)
+        # ラベルは整数のまま扱う(sparse_categorical_crossentropy)
+        train_y = np.asarray(train_y, dtype=np.int32)
         
-        # バリデーション用のパラメータ設定
+        # バリデーション用のデータ
         if (validate_x is not None) and (validate_y is not None):
-            vy_onehot = keras.utils.to_categorical(validate_y, num_classes=label_num)
-            validation_data = [validate_x, vy_onehot] 
+            validate_y = np.asarray(validate_y, dtype=np.int32)
         else:
             validation_split = self._params['validation_split']
-            train_x, validate_x, train_y_onehot, vy_onehot = train_test_split(
-                train_x, train_y_onehot, shuffle=True, test_size=validation_split)
-            validation_data = [validate_x, vy_onehot]
+            train_x, validate_x, train_y, validate_y = train_test_split(
+                train_x, train_y, shuffle=True, test_size=validation_split)
+        
+        # 入力パイプラインを作成する
+        train_dataset = _make_dataset(train_x, train_y, batch_size, shuffle=True)
+        validation_dataset = _make_dataset(validate_x, validate_y, batch_size, shuffle=False)
 
         # Early Stopping
         #   patience: 指定した回数改善しなければ終了
@@ -118,38 +125,23 @@ class ModelDnn(AbsModel):
             monitor='val_loss', min_delta=0, patience=early_stopping_patience, 
             restore_best_weights=True, verbose=1, mode='auto')
         
-        # self._max_epoch回数分、学習を実行する
-        epoch = 0
-        num_loop = int(np.ceil(max_epoch / epochs))
-        for i in range(num_loop):
-            
-            # 学習
-            self._model.fit(
-                train_x, train_y_onehot, 
-                epochs=epochs, batch_size=batch_size, 
-                shuffle=True, verbose=0, callbacks=[early_stopping], 
-                validation_data=validation_data,
-                #validation_split=validation_split
-            )
-            
-            # epochを更新する
-            epoch = epoch + epochs
-            
-            # 損失値と正解率を表示する
-            score = self._model.evaluate(train_x, train_y_onehot, verbose=0)
-            loss, acc = score[0], score[1]
-            if validation_data is not None:
-                score = self._model.evaluate(validation_data[0], validation_data[1], verbose=0)
-                val_loss, val_acc = score[0], score[1]
-            else:
-                val_loss, val_acc = 0, 0
-                
-            print('%07d : loss=%f, acc=%f val_loss=%f, val_acc=%f' % 
-                    (epoch, loss, acc, val_loss, val_acc))
-                    
-            # Early Stoppingが行われていればループを離脱する
-            if early_stopping.stopped_epoch > 0:
-                break
+        # 損失値と正解率を表示する(epochs回ごと, 学習時の値を使う)
+        def print_score(epoch, logs):
+            if (epoch + 1) % epochs == 0:
+                _print_score(epoch + 1, logs)
+        print_callback = keras.callbacks.LambdaCallback(on_epoch_end=print_score)
+        
+        # 最大max_epoch回数分、学習を実行する
+        history = self._model.fit(
+            train_dataset, epochs=max_epoch, verbose=0, 
+            callbacks=[early_stopping, print_callback], 
+            validation_data=validation_dataset,
+        )
+        
+        # 最終epochの損失値と正解率を表示する(未表示の場合)
+        if len(history.epoch) % epochs != 0:
+            last_logs = {key: values[-1] for key, values in history.history.items()}
+            _print_score(len(history.epoch), last_logs)
             
     ##################################################
     # 予測
@@ -177,6 +169,10 @@ class ModelDnn(AbsModel):
         file_path = os.path.join(self._model_dir, file_name)
         self._model.save(file_path)
         
+        # スケーラの統計量を保存する
+        if self._scaler is not None:
+            self._scaler.save(self._get_scaler_path())
+        
     ##################################################
     # モデルをファイルからロードする
     ##################################################
@@ -187,3 +183,80 @@ class ModelDnn(AbsModel):
         file_path = os.path.join(self._model_dir, file_name)
         self._model = load_model(file_path)
         
+        # スケーラの統計量を読み込む
+        scaler_path = self._get_scaler_path()
+        if os.path.isfile(scaler_path):
+            self._scaler = util.Float32Scaler.load(scaler_path)
+        
+    ##################################################
+    # 入力の標準化に使用したスケーラを設定する
+    ##################################################
+    def set_scaler(self, scaler):
+        self._scaler = scaler
+        
+    ##################################################
+    # 入力の標準化に使用したスケーラを取得する
+    ##################################################
+    def get_scaler(self):
+        return self._scaler
+        
+    ##################################################
+    # スケーラのファイルパスを取得する
+    ##################################################
+    def _get_scaler_path(self):
+        file_name = "{0:s}_scaler.npz".format(self._run_fold_name)
+        return os.path.join(self._model_dir, file_name)
+        
+
+##################################################
+# 入力パイプラインを作成する
+##################################################
+def _make_dataset(data_x, data_y, batch_size, shuffle):
+    """ 入力パイプラインを作成する
+        
+        行のインデックスのみをシャッフル・バッチ化し、バッチごとに配列から
+        データを取り出す(データ全体をシャッフル用のバッファに複製しない)。
+        取り出しと学習はprefetchにより並行して行う。
+    
+    Args:
+        data_x(ndarray)     : 入力
+        data_y(ndarray)     : 出力(ラベルの整数値)
+        batch_size(int)     : バッチサイズ
+        shuffle(bool)       : epochごとにシャッフルするか否か
+
+    Returns:
+        tf.data.Dataset : 入力パイプライン
+    """
+    data_x = np.ascontiguousarray(data_x, dtype=np.float32)
+    data_y = np.ascontiguousarray(data_y, dtype=np.int32)
+    input_dim = data_x.shape[1]
+    
+    # バッチのデータを取り出す関数
+    def get_batch(index):
+        return data_x[index], data_y[index]
+    
+    def map_batch(index):
+        batch_x, batch_y = tf.numpy_function(get_batch, [index], [tf.float32, tf.int32])
+        batch_x.set_shape([None, input_dim])
+        batch_y.set_shape([None])
+        return batch_x, batch_y
+    
+    dataset = tf.data.Dataset.range(len(data_x))
+    if shuffle:
+        dataset = dataset.shuffle(len(data_x), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    dataset = dataset.map(map_batch, num_parallel_calls=tf.data.AUTOTUNE)
+    
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+##################################################
+# 損失値と正解率を表示する
+##################################################
+def _print_score(epoch, logs):
+    
+    # 正解率のキーはバージョンにより'accuracy'または'acc'
+    acc_key = 'accuracy' if 'accuracy' in logs else 'acc'
+    
+    print('%07d : loss=%f, acc=%f val_loss=%f, val_acc=%f' % 
+            (epoch, logs['loss'], logs[acc_key], 
+             logs.get('val_loss', 0), logs.get('val_' + acc_key, 0)))
@@ -5,6 +5,7 @@ from .abs_model import AbsModel
 import os
 import xgboost as xgb
 import matplotlib.pyplot as plt
+from .xgb_dataset import XgbDataset, XgbDataIter
 
 ##################################################
 # XGBoost
@@ -17,6 +18,17 @@ class ModelXgboost(AbsModel):
         params (dict)           : パラメータ
     """
     
+    # 性能に関するパラメータの既定値
+    #   (paramsに指定した場合はxgb_paramより優先し、未指定の場合はxgb_paramの値を使う)
+    #   tree_method : 決定木の構築方法('hist', 'approx'等)
+    #   max_bin     : ヒストグラムのビン数
+    #   nthread     : 学習・予測のスレッド数(Noneの場合は全てのCPUを使う)
+    _PERFORMANCE_PARAM_DEFAULTS = {
+        'tree_method'   : 'hist',
+        'max_bin'       : 256,
+        'nthread'       : None,
+    }
+    
     ##################################################
     # コンストラクタ
     ##################################################
@@ -26,6 +38,13 @@ class ModelXgboost(AbsModel):
         Args:
             run_fold_name(string)   : ランとfoldを組み合わせた名称
             params(dict)            : パラメータ
+                xgb_param(dict)         : XGBoostのパラメータ
+                tree_method(string)     : 決定木の構築方法 (ex) 'hist', 'approx'
+                max_bin(int)            : ヒストグラムのビン数
+                nthread(int)            : 学習・予測のスレッド数
+                external_memory(dict)   : 外部メモリで学習する場合の設定(Noneの場合はメモリ上で学習する)
+                    cache_dir(string)       : XGBoostのキャッシュファイルのディレクトリ
+                    batch_rows(int)         : 1回にXGBoostに渡す行数
         """
         
         # 抽象クラスのコンストラクタ
@@ -43,18 +62,20 @@ class ModelXgboost(AbsModel):
         """ 学習
         
         Args:
-            train_x(DataFrame)  : 学習データ(入力)
-            train_y(DataFrame)  : 学習データ(出力)
+            train_x(DataFrame, DMatrix)     : 学習データ(入力) DMatrixの場合はラベルを含む
+            train_y(DataFrame)              : 学習データ(出力)
+            validate_x(DataFrame, DMatrix)  : 検証データ(入力) DMatrixの場合はラベルを含む
+            validate_y(DataFrame)           : 検証データ(出力)
         """
-        dtrain = xgb.DMatrix(train_x, label=train_y)
+        dtrain = self.make_dmatrix(train_x, train_y, name='train')
         
-        if (validate_x is not None) and (validate_y is not None):
-            dvalid = xgb.DMatrix(validate_x, label=validate_y)
+        if (validate_x is not None) and ((validate_y is not None) or isinstance(validate_x, xgb.DMatrix)):
+            dvalid = self.make_dmatrix(validate_x, validate_y, name='valid')
             evallist = [(dtrain, 'train'), (dvalid, 'eval')]
         else:
             evallist = [(dtrain, 'train')]
         
-        xgb_param = self._params['xgb_param']
+        xgb_param = self._get_xgb_param()
         num_round = self._params['num_round']
         early_stopping_rounds = self._params['early_stopping_rounds']
         verbose_eval = self._params['verbose_eval']
@@ -74,12 +95,12 @@ class ModelXgboost(AbsModel):
         """ 予測
         
         Args:
-            test_x(DataFrame)   : テストデータ(入力)
+            test_x(DataFrame, DMatrix)  : テストデータ(入力)
 
         Returns:
             DataFrame : テストデータ(出力)
         """
-        dtest = xgb.DMatrix(test_x)
+        dtest = self.make_dmatrix(test_x, name='test')
         pred_y = self._model.predict(dtest)
         
         print('Best Score:{0:.4f}, Iteratin:{1:d}, Ntree_Limit:{2:d}'.format(
@@ -107,7 +128,7 @@ class ModelXgboost(AbsModel):
         """
         file_name = "{0:s}.model".format(self._run_fold_name)
         file_path = os.path.join(self._model_dir, file_name)
-        self._model = xgb.Booster({'nthread': 1})
+        self._model = xgb.Booster(self._get_thread_param())
         self._model.load_model(file_path)
 
     ##################################################
@@ -162,4 +183,97 @@ class ModelXgboost(AbsModel):
         
         #graph1 = xgb.to_graphviz(self._model)
         #graph1.format = 'png'
-        #graph1.render('tree1')
\ No newline at end of file
+        #graph1.render('tree1')
+        
+    ##################################################
+    # 全データのデータセットを作成する
+    ##################################################
+    def make_dataset(self, data_x, data_y):
+        """ 全データのデータセットを作成する
+            (ヒストグラム法以外、または、外部メモリで学習する場合は作成しない)
+        
+        Args:
+            data_x(DataFrame)   : 全データ(入力)
+            data_y(DataFrame)   : 全データ(出力)
+        
+        Returns:
+            XgbDataset : データセット(作成しない場合はNone)
+        """
+        xgb_param = self._get_xgb_param()
+        if (xgb_param.get('tree_method') != 'hist') or self.uses_external_memory():
+            return None
+        
+        return XgbDataset(
+            data_x, data_y, max_bin=xgb_param.get('max_bin', 256), 
+            nthread=self._get_thread_param().get('nthread'))
+        
+    ##################################################
+    # 外部メモリで学習するか否か
+    ##################################################
+    def uses_external_memory(self):
+        return self._params.get('external_memory') is not None
+        
+    ##################################################
+    # XGBoostのパラメータを取得する
+    ##################################################
+    def _get_xgb_param(self):
+        """ XGBoostのパラメータを取得する
+            (paramsに指定した性能に関するパラメータはxgb_paramを上書きし、
+             未指定のパラメータはxgb_paramに無い場合のみ既定値を設定する)
+        
+        Returns:
+            dict : XGBoostのパラメータ
+        """
+        xgb_param = dict(self._params['xgb_param'])
+        for key, default in self._PERFORMANCE_PARAM_DEFAULTS.items():
+            if self._params.get(key) is not None:
+                xgb_param[key] = self._params[key]
+            elif default is not None:
+                xgb_param.setdefault(key, default)
+        
+        return xgb_param
+        
+    ##################################################
+    # スレッド数のパラメータを取得する
+    ##################################################
+    def _get_thread_param(self):
+        nthread = self._get_xgb_param().get('nthread')
+        return {'nthread': nthread} if nthread is not None else {}
+        
+    ##################################################
+    # DMatrixを作成する
+    ##################################################
+    def make_dmatrix(self, data_x, data_y=None, rows=None, name='train'):
+        """ DMatrixを作成する(DMatrixの場合はそのまま返す)
+            外部メモリで学習する場合は、指定した行を一定の行数ごとにXGBoostに渡して
+            XGBoostのキャッシュファイルに書き出す
+            (data_xの行を切り出した複製は作らないため、data_xをutil.load_typed_frameの
+             メモリマップで開いた場合は、全データをメモリに展開せずに学習できる)
+        
+        Args:
+            data_x(DataFrame, DMatrix)  : 全データ(入力)
+            data_y(DataFrame)           : 全データ(出力)
+            rows(ndarray)               : 対象の行のインデックス(Noneの場合は全ての行)
+            name(string)                : キャッシュファイルの名称 (ex) 'train'
+        
+        Returns:
+            DMatrix : 作成したDMatrix
+        """
+        if isinstance(data_x, xgb.DMatrix):
+            return data_x if rows is None else data_x.slice(rows)
+        
+        nthread = self._get_thread_param().get('nthread')
+        external_memory = self._params.get('external_memory')
+        if external_memory is None:
+            if rows is not None:
+                data_x = data_x.iloc[rows]
+                data_y = data_y.iloc[rows] if data_y is not None else None
+            return xgb.DMatrix(data_x, label=data_y, nthread=nthread)
+        
+        cache_prefix = os.path.join(
+            external_memory['cache_dir'], '{0:s}_{1:s}'.format(self._run_fold_name, name))
+        data_iter = XgbDataIter(
+            data_x, data_y, rows=rows, batch_rows=external_memory.get('batch_rows', 100000), 
+            cache_prefix=cache_prefix)
+        
+        return xgb.DMatrix(data_iter, nthread=nthread)
@@ -0,0 +1,148 @@
+# coding: utf-8
+
+import os
+import numpy as np
+import xgboost as xgb
+
+##################################################
+# XGBoostのデータセット
+##################################################
+class XgbDataset:
+    """ XGBoostのデータセット
+
+        全データのQuantileDMatrixを1回だけ作成し、分位点(ヒストグラムのビンの境界)を全foldで共有する。
+        foldごとの訓練データは全データのQuantileDMatrixを、検証データは訓練データをrefに指定して、
+        全データと行のインデックスから作成する。
+        分位点の算出はfoldごとに繰り返さないが、foldごとに量子化した行の複製は作成する。
+        (全データから一定の行数ごとにXGBoostに渡すため、密行列の複製は作らない)
+
+    Attributes:
+        data_x (DataFrame)  : 全データ(入力)
+        data_y (DataFrame)  : 全データ(出力)
+        dmatrix (QuantileDMatrix)   : 全データのQuantileDMatrix
+    """
+
+    ##################################################
+    # コンストラクタ
+    ##################################################
+    def __init__(self, data_x, data_y, max_bin=256, batch_rows=100000, nthread=None):
+        """ コンストラクタ
+
+        Args:
+            data_x(DataFrame)   : 全データ(入力)
+            data_y(DataFrame)   : 全データ(出力)
+            max_bin(int)        : ヒストグラムのビン数(学習時のmax_binと一致させる)
+            batch_rows(int)     : 1回にXGBoostに渡す行数
+            nthread(int)        : スレッド数
+        """
+        self.data_x = data_x
+        self.data_y = data_y
+        self._max_bin = max_bin
+        self._batch_rows = batch_rows
+        self._nthread = nthread
+
+        self.dmatrix = self._make_quantile_dmatrix(None, None)
+
+    ##################################################
+    # foldの訓練データ・検証データを作成する
+    ##################################################
+    def make_fold(self, train_rows, test_rows):
+        """ foldの訓練データ・検証データを作成する
+
+        Args:
+            train_rows(ndarray) : 訓練データの行のインデックス
+            test_rows(ndarray)  : 検証データの行のインデックス
+
+        Returns:
+            QuantileDMatrix : 訓練データ(ラベルを含む)
+            QuantileDMatrix : 検証データ(ラベルを含む)
+        """
+        dtrain = self._make_quantile_dmatrix(train_rows, self.dmatrix)
+        dvalid = self._make_quantile_dmatrix(test_rows, dtrain)
+        return dtrain, dvalid
+
+    ##################################################
+    # 行数
+    ##################################################
+    def __len__(self):
+        return self.dmatrix.num_row()
+
+    ##################################################
+    # 指定した行のQuantileDMatrixを作成する
+    ##################################################
+    def _make_quantile_dmatrix(self, rows, ref):
+        data_iter = XgbDataIter(self.data_x, self.data_y, rows=rows, batch_rows=self._batch_rows)
+        return xgb.QuantileDMatrix(data_iter, ref=ref, max_bin=self._max_bin, nthread=self._nthread)
+
+##################################################
+# XGBoostの外部メモリ用のデータイテレータ
+##################################################
+class XgbDataIter(xgb.DataIter):
+    """ XGBoostの外部メモリ用のデータイテレータ
+
+        指定した行を一定の行数ごとに区切り、順番にXGBoostに渡す。
+        XGBoostは受け取ったデータをcache_prefixのファイルに書き出して学習するため、
+        全データを密行列としてメモリに展開する必要が無い。
+        (util.load_typed_frameで読み取り専用のメモリマップで開いたDataFrameを渡すと、
+         区切った行のみがファイルから読み込まれる)
+
+    Attributes:
+        data_x (DataFrame)  : 全データ(入力)
+        data_y (DataFrame)  : 全データ(出力)
+    """
+
+    ##################################################
+    # コンストラクタ
+    ##################################################
+    def __init__(self, data_x, data_y=None, rows=None, batch_rows=100000, cache_prefix=None):
+        """ コンストラクタ
+
+        Args:
+            data_x(DataFrame)   : 全データ(入力)
+            data_y(DataFrame)   : 全データ(出力)
+            rows(ndarray)       : 対象の行のインデックス(Noneの場合は全ての行)
+            batch_rows(int)     : 1回に渡す行数
+            cache_prefix(string): XGBoostの外部メモリのキャッシュファイルのPrefix
+        """
+        self.data_x = data_x
+        self.data_y = data_y
+
+        # 対象の行を一定の行数ごとに区切る
+        if rows is None:
+            rows = np.arange(len(data_x))
+        self._batches = [rows[i:i+batch_rows] for i in range(0, len(rows), batch_rows)]
+        self._batch_no = 0
+
+        if cache_prefix is not None:
+            os.makedirs(os.path.dirname(cache_prefix) or '.', exist_ok=True)
+        super().__init__(cache_prefix=cache_prefix)
+
+    ##################################################
+    # 次のデータを渡す
+    ##################################################
+    def next(self, input_data):
+        """ 次のデータを渡す
+
+        Args:
+            input_data(function) : データを受け取るXGBoostの関数
+
+        Returns:
+            bool : データを渡したか否か(全て渡し終えた場合はFalse)
+        """
+        if self._batch_no >= len(self._batches):
+            return False
+
+        rows = self._batches[self._batch_no]
+        if self.data_y is not None:
+            input_data(data=self.data_x.iloc[rows], label=self.data_y.iloc[rows])
+        else:
+            input_data(data=self.data_x.iloc[rows])
+
+        self._batch_no += 1
+        return True
+
+    ##################################################
+    # 先頭に戻る
+    ##################################################
+    def reset(self):
+        self._batch_no = 0
@@ -4,8 +4,10 @@ from .abs_runner import AbsRunner
 
 import os
 import copy
+import numpy as np
 import pandas as pd
 import keras
+from concurrent.futures import ProcessPoolExecutor
 
 import util
 from loader import GsmLoader2020Ver3
@@ -13,6 +15,9 @@ from model import ModelXgboost, ModelDnn
 
 from sklearn.model_selection import train_test_split, KFold, StratifiedKFold
 
+# クロスバリデーションのワーカープロセスが保持する全データ
+_cv_worker_data = {}
+
 ##################################################
 # GSMデータを用いた学習・評価・予測 実行クラス
 # 2020 Ver3。
@@ -52,6 +57,9 @@ class GsmForecastRunner2020Ver3(AbsRunner):
         self._class_names = self._params['class_names']
         self._label_name = self._params['label_name']
         
+        # メモリマップで共有する全データ(入力)の保存先
+        self._whole_data_dir = None
+        
     ##################################################
     # foldを指定して学習・評価を行う
     ##################################################
@@ -66,38 +74,25 @@ class GsmForecastRunner2020Ver3(AbsRunner):
         # データをロードする
         self._load_data()
         
-        # モデルをクロスバリデーションの分割数分作成する
-        self._cv_models = []
-        for i in range(fold_splits):
-            model = copy.deepcopy(self._model)
-            self._cv_models.append(model)
-        
+        # foldごとの訓練データ・検証データのインデックス
         fold = KFold(n_splits=fold_splits, shuffle=False)
-        for i, (train_index, test_index) in enumerate(fold.split(self._whole_x, self._whole_y)):
-            
-            model = self._cv_models[i]
-            
-            # 訓練データを抽出する
-            tx = self._whole_x.iloc[train_index]
-            ty = self._whole_y.iloc[train_index]
-            
-            # 検証データを抽出する
-            vx = self._whole_x.iloc[test_index]
-            vy = self._whole_y.iloc[test_index]
+        fold_indices = list(fold.split(self._whole_x, self._whole_y))
+        
+        # 学習・予測を行う
+        #   XGBoostの場合はfoldごとにプロセスを分けて並列に学習する
+        #   DNNの場合は順番に学習する
+        cv_workers = self._get_cv_workers(fold_splits)
+        if (type(self._model) is ModelXgboost) and (cv_workers > 1):
+            results = self._run_train_cv_parallel(fold_indices, cv_workers)
+        else:
+            results = self._run_train_cv_sequential(fold_indices)
+        self._cv_models = [model for model, pred_y in results]
+        
+        # 評価結果, 特徴量の重要度, Graphvizのグラフは親プロセスで出力する
+        for i, ((train_index, test_index), (model, pred_y)) in enumerate(zip(fold_indices, results)):
             
-            # モデルがDNNの場合はデータを正規化する
-            if type(self._model) is ModelDnn:
-                # Max-Minスケール化
-                #scaler, tx, vx = util.max_min_scale(tx, vx)
-                # 標準化
-                scaler, tx, vx = util.standardize(tx, vx)
-                
-            # 学習を行う
             run_fold_name = '{0:s}_fold_{1:02d}'.format(self._run_name, i) 
-            model.train(tx, ty, vx, vy)
-            
-            # 予測を行う
-            pred_y = model.predict(vx) 
+            vy = self._whole_y.iloc[test_index]
             
             # 評価結果を出力する
             self._print_evaluation_score(model, run_fold_name, vy, pred_y)
@@ -108,6 +103,103 @@ class GsmForecastRunner2020Ver3(AbsRunner):
             # Graphvizのグラフをファイルに出力する
             self._export_graphviz(model, run_fold_name)
             
+    ##################################################
+    # クロスバリデーションの各foldを順番に学習する
+    ##################################################
+    def _run_train_cv_sequential(self, fold_indices):
+        
+        standardize = type(self._model) is ModelDnn
+        
+        # XGBoostの場合は全データのQuantileDMatrixを1回だけ作成し、分位点を全foldで共有する
+        #   (外部メモリで学習する場合はfoldごとにキャッシュファイルに書き出す)
+        dataset = None
+        if type(self._model) is ModelXgboost:
+            dataset = self._model.make_dataset(self._whole_x, self._whole_y)
+        
+        # DNNの場合は全データのfloat32の配列を全foldで共有する
+        whole_x = self._whole_x
+        if standardize:
+            whole_x = self._whole_x.to_numpy(dtype=np.float32)
+        
+        results = []
+        for i, (train_index, test_index) in enumerate(fold_indices):
+            model = self._copy_model_for_fold(i)
+            results.append(_train_cv_fold(
+                model, whole_x, self._whole_y, train_index, test_index, standardize, dataset))
+        
+        return results
+    
+    ##################################################
+    # クロスバリデーションの各foldを並列に学習する
+    ##################################################
+    def _run_train_cv_parallel(self, fold_indices, cv_workers):
+        
+        # ワーカー間でCPUを分け合うように、XGBoostのスレッド数を設定する
+        nthread = max(1, (os.cpu_count() or 1) // cv_workers)
+        models = [self._copy_model_for_fold(i, nthread) for i in range(len(fold_indices))]
+        
+        # 全データ(入力)はファイルに1回だけ書き出し、各ワーカーは読み取り専用のメモリマップで開く
+        #   (ワーカーにはファイルのパスのみ渡し、foldごとにはインデックスのみ渡す)
+        whole_data_dir = self._share_whole_data()
+        train_indices = [train_index for train_index, test_index in fold_indices]
+        test_indices = [test_index for train_index, test_index in fold_indices]
+        
+        # 全データのDMatrixは、1ワーカーが複数のfoldを学習する場合のみ作成する
+        #   (1ワーカー1foldの場合は、foldの訓練・検証データのみからDMatrixを作成する)
+        use_dataset = (not self._model.uses_external_memory()) and (len(fold_indices) > cv_workers)
+        with ProcessPoolExecutor(
+                max_workers=cv_workers, initializer=_init_cv_worker, 
+                initargs=(whole_data_dir, self._whole_y, use_dataset)) as executor:
+            results = list(executor.map(_train_cv_fold_in_worker, models, train_indices, test_indices))
+        
+        return results
+    
+    ##################################################
+    # foldごとのモデルを作成する
+    ##################################################
+    def _copy_model_for_fold(self, fold_no, nthread=None):
+        
+        model = copy.deepcopy(self._model)
+        if type(model) is ModelXgboost:
+            
+            # スレッド数を設定する
+            if nthread is not None:
+                model.add_param('nthread', nthread)
+            
+            # 外部メモリのキャッシュファイルはfoldごとに分ける
+            external_memory = self._model._params.get('external_memory')
+            if external_memory is not None:
+                cache_dir = os.path.join(external_memory['cache_dir'], 'fold_{0:02d}'.format(fold_no))
+                model.add_param('external_memory', dict(external_memory, cache_dir=cache_dir))
+        
+        return model
+    
+    ##################################################
+    # クロスバリデーションの並列数を取得する
+    ##################################################
+    def _get_cv_workers(self, fold_splits):
+        
+        # 未指定の場合はfold数とCPU数の小さい方
+        cv_workers = self._params.get('cv_workers')
+        if cv_workers is None:
+            cv_workers = min(fold_splits, os.cpu_count() or 1)
+        
+        # ワーカーのメモリ使用量の合計がメモリの上限に収まるように制限する
+        #   ワーカー1つ当たり、全データのfloat32の約2倍
+        #   (foldの訓練・検証データのDataFrameとDMatrix, または, 全データとfoldのQuantileDMatrix)
+        memory_bytes = self._params.get('cv_memory_bytes')
+        if memory_bytes is None:
+            memory_bytes = _get_available_memory()
+        worker_bytes = self._whole_x.shape[0] * self._whole_x.shape[1] * np.dtype(np.float32).itemsize * 2
+        if (memory_bytes is not None) and (worker_bytes > 0):
+            max_workers = max(1, int(memory_bytes // worker_bytes))
+            if cv_workers > max_workers:
+                print('cv_workers: {0:d} -> {1:d} (memory: {2:.0f}MB, per worker: {3:.0f}MB)'.format(
+                        cv_workers, max_workers, memory_bytes / 1024**2, worker_bytes / 1024**2))
+                cv_workers = max_workers
+        
+        return cv_workers
+            
     ##################################################
     # クロスバリデーションで学習した
     # 各foldモデルの平均で予測を行う
@@ -128,8 +220,11 @@ class GsmForecastRunner2020Ver3(AbsRunner):
         if type(self._model) is ModelDnn:
             # Max-Minスケール化
             #self._train_all_scaler, train_x, _ = util.max_min_scale(train_x, None)
-            # 標準化
-            self._train_all_scaler, train_x, _ = util.standardize(train_x, None)
+            # 標準化(float32の複製を直接変換し、スケーラはモデルと一緒に保存する)
+            train_x = np.array(train_x, dtype=np.float32)
+            scaler = util.Float32Scaler()
+            train_x = scaler.fit_transform(train_x, inplace=True)
+            self._model.set_scaler(scaler)
             
         self._model.train(train_x, train_y)
         self.is_trained_all = True
@@ -149,7 +244,7 @@ class GsmForecastRunner2020Ver3(AbsRunner):
             
             # モデルがDNNの場合は学習時に使用したスケーラで正規化する
             if type(self._model) is ModelDnn:
-                test_x = self._train_all_scaler.transform(test_x)
+                test_x = self._model.get_scaler().transform(test_x.to_numpy(dtype=np.float32))
             
             # 予測を行う
             pred_y = self._model.predict(test_x)
@@ -198,9 +293,42 @@ class GsmForecastRunner2020Ver3(AbsRunner):
             # ラベル数をモデルに渡す
             self._label_num = self._train_y.nunique()
             self._model.add_param('label_num', self._label_num)
+            
+            # XGBoostを外部メモリで学習する場合は、全データ(入力)をファイルに書き出し、
+            # メモリ上のDataFrameを解放してメモリマップで開き直す
+            if (type(self._model) is ModelXgboost) and self._model.uses_external_memory():
+                del df
+                self._share_whole_data()
                 
             self._is_data_loaded = True
             
+    ##################################################
+    # 全データ(入力)をファイルに書き出し、メモリマップで開き直す
+    ##################################################
+    def _share_whole_data(self):
+        """ 全データ(入力)をファイルに書き出し、メモリマップで開き直す
+            
+            全データ(入力)をfloat32の型付きのバイナリ形式(util.save_typed_frame)で1回だけ保存し、
+            読み取り専用のメモリマップで開き直す。メモリ上のDataFrameは解放し、
+            訓練データ・テストデータもメモリマップの全データから切り出し直す。
+            (行を読み込む際は、アクセスした行のみがファイルから読み込まれる)
+        
+        Returns:
+            string : 保存先のディレクトリパス
+        """
+        if self._whole_data_dir is None:
+            whole_data_dir = os.path.join(self._base_dir, self._temp_dir, 'whole_data', self._run_name)
+            util.save_typed_frame(self._whole_x.astype(np.float32), whole_data_dir)
+            self._whole_x = util.load_typed_frame(whole_data_dir, read_only=True)
+            
+            if self._train_x is not None:
+                self._train_x, self._test_x, self._train_y, self._test_y = \
+                    self._train_test_split(self._whole_x, self._whole_y, 4, [3])
+            
+            self._whole_data_dir = whole_data_dir
+        
+        return self._whole_data_dir
+            
     ##################################################
     # 学習データ作成
     ##################################################
@@ -324,4 +452,99 @@ class GsmForecastRunner2020Ver3(AbsRunner):
             num_trees = 3
             
             model.export_graphviz(dir_path, file_prefix, num_trees)
-            
\ No newline at end of file
+            
+
+##################################################
+# 使用可能なメモリ量を取得する
+##################################################
+def _get_available_memory():
+    """ 使用可能なメモリ量(空きの物理メモリ)を取得する
+    
+    Returns:
+        int : メモリ量[byte] (取得できない場合はNone)
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+    
+##################################################
+# クロスバリデーションのワーカープロセスを初期化する
+##################################################
+def _init_cv_worker(whole_data_dir, whole_y, use_dataset):
+    
+    # 全データ(入力)は読み取り専用のメモリマップで開く(ワーカー間でページを共有する)
+    _cv_worker_data['whole_x'] = util.load_typed_frame(whole_data_dir, read_only=True)
+    _cv_worker_data['whole_y'] = whole_y
+    _cv_worker_data['use_dataset'] = use_dataset
+    _cv_worker_data['dataset'] = None
+    
+##################################################
+# ワーカープロセスで1foldの学習・予測を行う
+##################################################
+def _train_cv_fold_in_worker(model, train_index, test_index):
+    
+    # 全データのDMatrixはワーカーごとに、最初のfoldの学習時に1回だけ作成する
+    if _cv_worker_data['use_dataset'] and (_cv_worker_data['dataset'] is None):
+        _cv_worker_data['dataset'] = model.make_dataset(_cv_worker_data['whole_x'], _cv_worker_data['whole_y'])
+    
+    return _train_cv_fold(
+        model, _cv_worker_data['whole_x'], _cv_worker_data['whole_y'], 
+        train_index, test_index, False, _cv_worker_data['dataset'])
+
+##################################################
+# 1foldの学習・予測を行う
+##################################################
+def _train_cv_fold(model, whole_x, whole_y, train_index, test_index, standardize, dataset=None):
+    """ 1foldの学習・予測を行う
+    
+    Args:
+        model(AbsModel)         : モデル
+        whole_x(DataFrame)      : 全データ(入力) 標準化する場合はfloat32の配列
+        whole_y(DataFrame)      : 全データ(出力)
+        train_index(ndarray)    : 訓練データのインデックス
+        test_index(ndarray)     : 検証データのインデックス
+        standardize(bool)       : データを標準化するか否か
+        dataset(XgbDataset)     : 全データのデータセット(XGBoostの場合)
+    
+        XGBoostを外部メモリで学習する場合は、全データとfoldの行のインデックスから
+        DMatrixを作成する(全データの行を切り出した複製は作らない)。
+        この場合のwhole_xは、ファイルに書き出した全データを読み取り専用のメモリマップで
+        開いたもの(_share_whole_data)のため、一定の行数ごとにファイルから読み込まれる。
+    
+    Returns:
+        tuple : 学習済みのモデル, 検証データの予測結果
+    """
+    
+    # 訓練データ・検証データを抽出する
+    #   全データのデータセットがある場合は分位点を共有して作成する(ラベルを含む)
+    if dataset is not None:
+        tx, vx = dataset.make_fold(train_index, test_index)
+        ty, vy = None, None
+    elif (type(model) is ModelXgboost) and model.uses_external_memory():
+        # 外部メモリで学習する場合は、全データから指定した行のみをXGBoostに渡す
+        tx, ty = model.make_dmatrix(whole_x, whole_y, rows=train_index, name='train'), None
+        vx, vy = model.make_dmatrix(whole_x, whole_y, rows=test_index, name='valid'), None
+    elif standardize:
+        # 全データの配列から訓練データの統計量で標準化し、float32で切り出す(DNNの場合)
+        # Max-Minスケール化
+        #scaler, tx, vx = util.max_min_scale(whole_x[train_index], whole_x[test_index])
+        # 標準化
+        scaler = util.Float32Scaler().fit(whole_x, train_index)
+        tx = scaler.transform(whole_x, train_index)
+        ty = whole_y.iloc[train_index]
+        vx = scaler.transform(whole_x, test_index)
+        vy = whole_y.iloc[test_index]
+    else:
+        tx = whole_x.iloc[train_index]
+        ty = whole_y.iloc[train_index]
+        vx = whole_x.iloc[test_index]
+        vy = whole_y.iloc[test_index]
+    
+    # 学習を行う
+    model.train(tx, ty, vx, vy)
+    
+    # 予測を行う
+    pred_y = model.predict(vx)
+    
+    return model, pred_y
@@ -0,0 +1,46 @@
+# coding: utf-8
+
+import numpy as np
+
+from metpy.units import units
+from metpy.calc import dewpoint_from_relative_humidity, equivalent_potential_temperature
+
+import gsm
+
+##################################################
+# メイン
+##################################################
+if __name__ == '__main__':
+
+    # 検証用の気温[K],相対湿度[%],気圧[hPa] (float32)
+    rng = np.random.default_rng(0)
+    temp = rng.uniform(230, 310, 100000).astype(np.float32)
+    rh = rng.uniform(5, 100, temp.shape[0]).astype(np.float32)
+    pres = rng.uniform(850, 1000, temp.shape[0]).astype(np.float32)
+
+    # metpyで露点温度,湿数,相当温位を算出する
+    dewpoint = dewpoint_from_relative_humidity(
+                    temp.astype(np.float64) * units('K'),
+                    rh.astype(np.float64) / 100.
+    ).to(units('K'))
+    moisture = temp - dewpoint.magnitude
+    potensial_temp = equivalent_potential_temperature(
+                        pres.astype(np.float64) * units('hPa'),
+                        temp.astype(np.float64) * units('K'),
+                        dewpoint
+    ).magnitude
+
+    # gsm.thermoで湿数,相当温位をまとめて算出する
+    gsm_moisture, gsm_potensial_temp = \
+        gsm.moisture_and_equivalent_potential_temperature(pres, temp, rh)
+
+    # 差を確認する
+    #   metpy 1.7以降は飽和水蒸気圧にAmbaum(2020)の式を用いるため、
+    #   Boltonの式との差(相当温位で0.5%程度)が生じる
+    print('##### 湿数 #####')
+    print(gsm_moisture.dtype, np.abs(gsm_moisture - moisture).max())
+    print('##### 相当温位 #####')
+    print(gsm_potensial_temp.dtype, np.abs(gsm_potensial_temp - potensial_temp).max())
+
+    assert np.allclose(gsm_moisture, moisture, atol=0.1)
+    assert np.allclose(gsm_potensial_temp, potensial_temp, rtol=0.01)
@@ -1,5 +1,8 @@
 from util.analyze import *
+from util.cache import *
 from util.df import *
 from util.file import *
 from util.processing import *
+from util.scaler import *
+from util.typed_frame import *
 from util.visualize import *
@@ -0,0 +1,187 @@
+# coding: utf-8
+
+import os
+import time
+import pickle
+import hashlib
+import inspect
+
+##################################################
+# 処理段階ごとのキャッシュ
+##################################################
+class StageCache:
+    """ 処理段階ごとのキャッシュ
+
+        入力ファイルの状態, 処理のパラメータ, コードのバージョンから
+        キーを作成し、処理結果をキーごとに保存する。
+        保存したファイルの合計サイズが上限を超えた場合は、
+        最後に参照された日時が古いものから削除する。
+
+    Attributes:
+        cache_dir (string)  : キャッシュのディレクトリ
+        max_bytes (int)     : キャッシュの合計サイズの上限[byte]
+    """
+
+    # 管理情報のファイル名
+    _INDEX_FILENAME = 'index.pickle'
+
+    ##################################################
+    # コンストラクタ
+    ##################################################
+    def __init__(self, cache_dir, max_bytes=8*1024**3):
+        """ コンストラクタ
+
+        Args:
+            cache_dir(string)   : キャッシュのディレクトリ
+            max_bytes(int)      : キャッシュの合計サイズの上限[byte]
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    ##################################################
+    # キーを作成する
+    ##################################################
+    def make_key(self, stage, inputs, params, code_version):
+        """ キーを作成する
+
+        Args:
+            stage(string)       : 処理段階の名称 (ex) 'raw', 'thinned', 'features'
+            inputs(object)      : 入力(入力ファイルの状態, または前段のキー)
+            params(dict)        : 処理のパラメータ
+            code_version(string): コードのバージョン
+
+        Returns:
+            string : キー
+        """
+        source = repr((stage, inputs, sorted(params.items()), code_version))
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()
+        return '{0:s}_{1:s}'.format(stage, digest)
+
+    ##################################################
+    # キャッシュを読み込む
+    ##################################################
+    def load(self, key):
+        """ キャッシュを読み込む
+
+        Args:
+            key(string) : キー
+
+        Returns:
+            object : 保存した処理結果(キャッシュが無い場合はNone)
+        """
+        index = self._read_index()
+        if key not in index:
+            return None
+
+        file_path = os.path.join(self.cache_dir, index[key]['file'])
+        if not os.path.isfile(file_path):
+            return None
+
+        with open(file_path, 'rb') as f:
+            obj = pickle.load(f)
+
+        # 参照日時を更新する
+        index[key]['last_access'] = time.time()
+        self._write_index(index)
+
+        return obj
+
+    ##################################################
+    # キャッシュを保存する
+    ##################################################
+    def save(self, key, obj):
+        """ キャッシュを保存する
+            (合計サイズが上限を超えた場合は、参照日時の古いものから削除する)
+
+        Args:
+            key(string)     : キー
+            obj(object)     : 処理結果
+        """
+        file_name = '{0:s}.pickle'.format(key)
+        file_path = os.path.join(self.cache_dir, file_name)
+        temp_path = '{0:s}.tmp'.format(file_path)
+        with open(temp_path, 'wb') as f:
+            pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, file_path)
+
+        index = self._read_index()
+        index[key] = {
+            'file': file_name,
+            'size': os.path.getsize(file_path),
+            'last_access': time.time(),
+        }
+
+        # 参照日時の古いものから削除する(保存したものは残す)
+        total_size = sum([entry['size'] for entry in index.values()])
+        for old_key in sorted(index.keys(), key=lambda k: index[k]['last_access']):
+            if total_size <= self.max_bytes:
+                break
+            if old_key == key:
+                continue
+            old_path = os.path.join(self.cache_dir, index[old_key]['file'])
+            if os.path.isfile(old_path):
+                os.remove(old_path)
+            total_size -= index[old_key]['size']
+            del index[old_key]
+
+        self._write_index(index)
+
+    ##################################################
+    # 管理情報を読み込む
+    ##################################################
+    def _read_index(self):
+        index_path = os.path.join(self.cache_dir, self._INDEX_FILENAME)
+        if os.path.isfile(index_path):
+            with open(index_path, 'rb') as f:
+                return pickle.load(f)
+
+        # キー -> ファイル名, サイズ, 参照日時
+        return {}
+
+    ##################################################
+    # 管理情報を書き込む
+    ##################################################
+    def _write_index(self, index):
+        index_path = os.path.join(self.cache_dir, self._INDEX_FILENAME)
+        temp_path = '{0:s}.tmp'.format(index_path)
+        with open(temp_path, 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, index_path)
+
+##################################################
+# ファイルの状態の一覧を取得する
+##################################################
+def get_files_fingerprint(file_paths):
+    """ ファイルの状態(パス, サイズ, 更新日時)の一覧を取得する
+
+    Args:
+        file_paths(list[string]) : ファイルパスのリスト
+
+    Returns:
+        list[tuple] : ファイルの状態のリスト
+    """
+    fingerprint = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        fingerprint.append((os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns))
+
+    return fingerprint
+
+##################################################
+# コードのバージョンを取得する
+##################################################
+def get_code_version(*modules):
+    """ コードのバージョン(モジュール,関数のソースコードのハッシュ値)を取得する
+
+    Args:
+        modules(module) : モジュール(または関数)
+
+    Returns:
+        string : コードのバージョン
+    """
+    sha1 = hashlib.sha1()
+    for module in modules:
+        sha1.update(inspect.getsource(module).encode('utf-8'))
+
+    return sha1.hexdigest()
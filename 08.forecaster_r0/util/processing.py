@@ -1,6 +1,7 @@
 # coding: utf-8
 
 import numpy as np
+import pandas as pd
 from sklearn.preprocessing import MinMaxScaler, StandardScaler
 
 ##################################################
@@ -128,33 +129,187 @@ def add_time_variation(df, exclude_columns=['時', '日付'], inplace=True):
     else:
         new_df = df.copy()
     
-    # 列名のリストを取得する。
-    columns = new_df.columns
+    # 対象の列を取得する(指定した列は対象外とする)
+    columns = [column for column in new_df.columns if column not in exclude_columns]
     
-    for column in columns:
+    # 時間変化量の列をまとめて作成する
+    diff_df = new_df[columns].diff()
+    diff_df.columns = ['{0:s}_d1'.format(column) for column in columns]
+    new_df = pd.concat([new_df, diff_df], axis=1)
         
-        # 指定した列は対象外とする
-        if column in exclude_columns:
-            continue
-        
-        # 新しい列名を作成する
-        new_column = '{0:s}_d1'.format(column)
-        
-        # 時間変化量の列を作成
-        new_df[new_column] = new_df[column].diff()
+    return new_df
+    
+##################################################
+# 時系列の特徴量(差分,過去の値,移動統計量)をDataFrameに追加する
+##################################################
+def add_lag_features(df, diff_steps=[1], lag_steps=[], rolling_windows=[], 
+                     rolling_funcs=['mean', 'min', 'max'], interval_hours=6, 
+                     exclude_columns=['時', '日付'], inplace=True):
+    """ 時系列の特徴量(差分,過去の値,移動統計量)をDataFrameに追加する
         
+        対象の列をfloat32の配列にまとめ、特徴量の種類ごとに全列を一括で算出する。
+        日付,時から求めた時刻の間隔が(ステップ数×interval_hours)と一致しない行
+        (欠落した日を跨ぐ行)はNaNとする。
+        行は日付,時の昇順に並んでいる前提とする。
+
+    Args:
+        df(DataFrame)           : 変換対象のDataFrame
+        diff_steps(list)        : 差分のステップ数 (ex) [1, 4] -> 列名_d1, 列名_d4
+        lag_steps(list)         : 過去の値のステップ数 (ex) [1] -> 列名_lag1
+        rolling_windows(list)   : 移動統計量の窓幅(ステップ数) (ex) [4] -> 列名_roll4_mean
+        rolling_funcs(list)     : 移動統計量の種類('mean', 'min', 'max')
+        interval_hours(int)     : 1ステップの時間間隔[h] (ex) GSMの3,9,15,21時は6
+        exclude_columns(list)   : 変換対象から除外する列
+        inplace(bool)           : 元のDataFrameを変更するか否か
+
+    Returns:
+        DataFrame : 変換後のDataFrame
+    """
+    # ステップ数・窓幅は1以上とする
+    for name, steps in (('diff_steps', diff_steps), ('lag_steps', lag_steps), ('rolling_windows', rolling_windows)):
+        if any([step < 1 for step in steps]):
+            raise ValueError('{0:s} must be 1 or more: {1:s}'.format(name, str(list(steps))))
+    
+    if inplace:
+        new_df = df
+    else:
+        new_df = df.copy()
+    
+    # 対象の列をfloat32の配列にまとめる
+    columns = [column for column in new_df.columns if column not in exclude_columns]
+    block = new_df[columns].to_numpy(dtype=np.float32)
+    hours = _get_elapsed_hours(new_df)
+    
+    new_blocks = []
+    new_columns = []
+    
+    # 差分
+    for step in diff_steps:
+        new_blocks.append(block - _shift_block(block, hours, step, interval_hours))
+        new_columns.extend(['{0:s}_d{1:d}'.format(column, step) for column in columns])
+    
+    # 過去の値
+    for step in lag_steps:
+        new_blocks.append(_shift_block(block, hours, step, interval_hours))
+        new_columns.extend(['{0:s}_lag{1:d}'.format(column, step) for column in columns])
+    
+    # 移動統計量
+    for window in rolling_windows:
+        rolling = _rolling_block(block, hours, window, interval_hours, rolling_funcs)
+        for func, values in zip(rolling_funcs, rolling):
+            new_blocks.append(values)
+            new_columns.extend(['{0:s}_roll{1:d}_{2:s}'.format(column, window, func) for column in columns])
+    
+    # 特徴量の列をまとめて追加する
+    if len(new_blocks) > 0:
+        feature_df = pd.DataFrame(np.concatenate(new_blocks, axis=1), columns=new_columns, index=new_df.index)
+        new_df = pd.concat([new_df, feature_df], axis=1)
+    
     return new_df
     
+##################################################
+# 各行の経過時間[h]を取得する
+##################################################
+def _get_elapsed_hours(df):
+    """ 各行の経過時間[h]を日付,時から取得する
+
+    Args:
+        df(DataFrame) : 対象のDataFrame
+
+    Returns:
+        ndarray : 経過時間[h]
+    """
+    hours = df['日付'].to_numpy().astype('datetime64[h]').astype(np.int64)
+    if '時' in df.columns:
+        hours = hours + df['時'].to_numpy(dtype=np.int64)
+    
+    return hours
+    
+##################################################
+# 配列を指定したステップ数だけずらす
+##################################################
+def _shift_block(block, hours, step, interval_hours):
+    """ 配列を指定したステップ数だけずらす
+        (時刻の間隔がステップ数と一致しない行はNaNとする)
+
+    Args:
+        block(ndarray)      : 対象の配列(行, 列)
+        hours(ndarray)      : 各行の経過時間[h]
+        step(int)           : ステップ数
+        interval_hours(int) : 1ステップの時間間隔[h]
+
+    Returns:
+        ndarray : ずらした配列(行, 列)
+    """
+    shifted = np.full_like(block, np.nan)
+    if step < len(block):
+        valid = (hours[step:] - hours[:-step]) == step * interval_hours
+        shifted[step:] = np.where(valid[:, np.newaxis], block[:-step], np.nan)
+    
+    return shifted
+    
+##################################################
+# 移動統計量を算出する
+##################################################
+def _rolling_block(block, hours, window, interval_hours, funcs):
+    """ 移動統計量を算出する
+        (窓の中に欠落した時刻がある行はNaNとする)
+
+    Args:
+        block(ndarray)      : 対象の配列(行, 列)
+        hours(ndarray)      : 各行の経過時間[h]
+        window(int)         : 窓幅(ステップ数)
+        interval_hours(int) : 1ステップの時間間隔[h]
+        funcs(list)         : 統計量の種類('mean', 'min', 'max')
+
+    Returns:
+        list[ndarray] : 統計量ごとの配列(行, 列)
+    """
+    reducers = {'mean': np.mean, 'min': np.min, 'max': np.max}
+    
+    results = [np.full_like(block, np.nan) for func in funcs]
+    if window <= len(block):
+        # 窓の先頭と末尾の時刻の間隔で、窓の中の欠落を判定する
+        span = window - 1
+        valid = (hours[span:] - hours[:len(hours)-span]) == span * interval_hours
+        windows = np.lib.stride_tricks.sliding_window_view(block, window, axis=0)
+        for result, func in zip(results, funcs):
+            values = reducers[func](windows, axis=-1)
+            result[span:] = np.where(valid[:, np.newaxis], values, np.nan)
+    
+    return results
+    
+##################################################
+# 月平均を算出する
+##################################################
+def get_monthly_mean(df, columns):
+    """ 月平均を算出する
+        (学習データで算出した月平均を予測時に再利用する場合に使う)
+
+    Args:
+        df(DataFrame)   : 対象のDataFrame
+        columns(list)   : 対象の列
+
+    Returns:
+        DataFrame : 月平均(行:月, 列:対象の列)
+    """
+    base_columns = _get_monthly_target_columns(df, columns)
+    month = df['日付'].dt.month.rename('月')
+    
+    return df[base_columns].groupby(month).mean()
+    
 ##################################################
 # 月平均との差分をDataFrameに追加する
 ##################################################
-def add_difference_monthly_mean(df, columns, inplace=True):
+def add_difference_monthly_mean(df, columns, monthly_mean=None, inplace=True):
     """ 月平均との差分をDataFrameに追加する
 
     Args:
-        df(DataFrame)   : 変換対象のDataFrame
-        columns(list)   : 変換対象の列
-        inplace(bool)   : 元のDataFrameを変更するか否か
+        df(DataFrame)           : 変換対象のDataFrame
+        columns(list)           : 変換対象の列
+        monthly_mean(DataFrame) : 算出済みの月平均(get_monthly_meanの戻り値)
+                                  Noneの場合はdfから算出する
+        inplace(bool)           : 元のDataFrameを変更するか否か
 
     Returns:
         DataFrame : 変換後のDataFrame
@@ -164,33 +319,17 @@ def add_difference_monthly_mean(df, columns, inplace=True):
     else:
         new_df = df.copy()
     
-    # 変換対象の列をリストに格納する
-    base_columns = []
-    for base_col in columns:
-        base_cols = [col for col in df.columns if(base_col in col)]
-        base_columns.extend(base_cols)
-    
-    # 月の列を追加する
-    new_df['月'] = new_df['日付'].dt.month
+    # 変換対象の列の月平均を、各行に展開する
+    base_columns = _get_monthly_target_columns(new_df, columns)
+    mean = _get_monthly_mean_of_rows(new_df, base_columns, monthly_mean)
     
-    # 月ごとの平均値を算出する
-    mean = new_df.groupby(['月']).mean()
-    
-    # 1列ずつ月平均値との差分列を追加する
-    for column in base_columns:
-        
-        # 新しい列を追加する
-        new_column = '{0:s}_diff_month'.format(column)
-        new_df[new_column] = new_df[column]
-        
-        # 月数分ループ。月単位で平均値との差分を代入する。
-        for index, row in mean.iterrows():
-            
-            month = index
-            new_df[new_column] = new_df[new_column].mask(new_df['月']==month, new_df[column] - row[column])
+    # 月平均値との差分列をまとめて追加する
+    new_columns = ['{0:s}_diff_month'.format(column) for column in base_columns]
+    diff = new_df[base_columns].to_numpy() - mean
+    diff_df = pd.DataFrame(diff, columns=new_columns, index=new_df.index)
+    new_df = pd.concat([new_df, diff_df], axis=1)
     
     # 不要な列を削除する    
-    new_df = new_df.drop(columns=['月'])
     #new_df = new_df.drop(columns=base_columns)
     
     return new_df
@@ -198,13 +337,15 @@ def add_difference_monthly_mean(df, columns, inplace=True):
 ##################################################
 # 月平均をDataFrameに追加する
 ##################################################
-def add_monthly_mean(df, columns, inplace=True):
+def add_monthly_mean(df, columns, monthly_mean=None, inplace=True):
     """ 月平均をDataFrameに追加する
 
     Args:
-        df(DataFrame)   : 変換対象のDataFrame
-        columns(list)   : 変換対象の列
-        inplace(bool)   : 元のDataFrameを変更するか否か
+        df(DataFrame)           : 変換対象のDataFrame
+        columns(list)           : 変換対象の列
+        monthly_mean(DataFrame) : 算出済みの月平均(get_monthly_meanの戻り値)
+                                  Noneの場合はdfから算出する
+        inplace(bool)           : 元のDataFrameを変更するか否か
 
     Returns:
         DataFrame : 変換後のDataFrame
@@ -214,33 +355,59 @@ def add_monthly_mean(df, columns, inplace=True):
     else:
         new_df = df.copy()
     
-    # 変換対象の列をリストに格納する
-    add_columns = []
-    for add_col in columns:
-        add_cols = [col for col in df.columns if(add_col in col)]
-        add_columns.extend(add_cols)
+    # 変換対象の列の月平均を、各行に展開する
+    add_columns = _get_monthly_target_columns(new_df, columns)
+    mean = _get_monthly_mean_of_rows(new_df, add_columns, monthly_mean)
     
-    # 月の列を追加する
-    new_df['月'] = new_df['日付'].dt.month
+    # 月の平均値の列をまとめて追加する
+    new_columns = ['{0:s}_month_mean'.format(column) for column in add_columns]
+    mean_df = pd.DataFrame(mean, columns=new_columns, index=new_df.index)
+    new_df = pd.concat([new_df, mean_df], axis=1)
     
-    # 月ごとの平均値を算出する
-    mean = new_df.groupby(['月']).mean()
-    
-    # 1列ずつ月の平均値を追加する
-    for column in add_columns:
-        
-        # 新しい列を追加する
-        new_column = '{0:s}_month_mean'.format(column)
-        new_df[new_column] = new_df[column]
-        
-        # 月数分ループ。月単位で平均値との差分を代入する。
-        for index, row in mean.iterrows():
-            
-            month = index
-            new_df[new_column] = new_df[new_column].mask(new_df['月']==month, row[column])
+    return new_df
+
+##################################################
+# 月平均の変換対象の列を取得する
+##################################################
+def _get_monthly_target_columns(df, columns):
+    """ 月平均の変換対象の列を取得する
+
+    Args:
+        df(DataFrame)   : 対象のDataFrame
+        columns(list)   : 変換対象の列(列名の一部)
+
+    Returns:
+        list : 変換対象の列名のリスト
+    """
+    target_columns = []
+    for target_col in columns:
+        target_cols = [col for col in df.columns if(target_col in col)]
+        target_columns.extend(target_cols)
     
-    # 不要な列を削除する    
-    new_df = new_df.drop(columns=['月'])
+    # 重複を除く
+    return list(dict.fromkeys(target_columns))
+
+##################################################
+# 各行の月の平均値を取得する
+##################################################
+def _get_monthly_mean_of_rows(df, columns, monthly_mean):
+    """ 各行の月の平均値を取得する
+
+    Args:
+        df(DataFrame)           : 対象のDataFrame
+        columns(list)           : 対象の列
+        monthly_mean(DataFrame) : 算出済みの月平均 Noneの場合はdfから算出する
+
+    Returns:
+        ndarray : 各行の月の平均値(行, 列)
+    """
+    month = df['日付'].dt.month
     
-    return new_df
+    if monthly_mean is None:
+        # 対象の列のみ、月ごとにまとめて平均値を算出する
+        mean = df[columns].groupby(month).transform('mean')
+    else:
+        # 算出済みの月平均を各行の月で引く
+        mean = monthly_mean[columns].reindex(month.to_numpy())
     
+    return mean.to_numpy()
@@ -0,0 +1,147 @@
+# coding: utf-8
+
+import os
+import numpy as np
+
+##################################################
+# float32の標準化(平均0, 分散1になるように変換)
+##################################################
+class Float32Scaler:
+    """ float32の標準化(平均0, 分散1になるように変換)
+
+        全データの配列を共有し、行のインデックスを指定して統計量の算出・変換を行う。
+        統計量はfloat64で集計し、変換結果はfloat32で出力する。
+        一定の行数ごとに処理するため、float64の複製は作らない。
+
+    Attributes:
+        mean (ndarray)  : 列ごとの平均値
+        scale (ndarray) : 列ごとの標準偏差(0の列は1)
+    """
+
+    # 1回に処理する行数
+    _CHUNK_ROWS = 65536
+
+    ##################################################
+    # コンストラクタ
+    ##################################################
+    def __init__(self, mean=None, scale=None):
+        """ コンストラクタ
+
+        Args:
+            mean(ndarray)   : 列ごとの平均値
+            scale(ndarray)  : 列ごとの標準偏差
+        """
+        self.mean = mean
+        self.scale = scale
+
+    ##################################################
+    # 統計量を算出する
+    ##################################################
+    def fit(self, base, rows=None):
+        """ 統計量(平均値,標準偏差)を算出する
+
+        Args:
+            base(ndarray)   : 全データの配列(行, 列)
+            rows(ndarray)   : 対象の行のインデックス(Noneの場合は全ての行)
+
+        Returns:
+            Float32Scaler : 自身
+        """
+        num_rows = len(base) if rows is None else len(rows)
+        count = 0
+        mean = np.zeros(base.shape[1], dtype=np.float64)
+        m2 = np.zeros(base.shape[1], dtype=np.float64)
+
+        # 一定の行数ごとに平均値と偏差平方和を算出し、結合する(Chanの方法)
+        for start in range(0, num_rows, self._CHUNK_ROWS):
+            chunk = self._get_chunk(base, rows, start)
+            chunk_count = len(chunk)
+            chunk_mean = chunk.mean(axis=0, dtype=np.float64)
+            chunk_m2 = ((chunk - chunk_mean.astype(np.float32)) ** 2).sum(axis=0, dtype=np.float64)
+
+            delta = chunk_mean - mean
+            total = count + chunk_count
+            mean = mean + delta * (chunk_count / total)
+            m2 = m2 + chunk_m2 + delta ** 2 * (count * chunk_count / total)
+            count = total
+
+        # 標準偏差が0の列は変換しない
+        scale = np.sqrt(m2 / max(count, 1))
+        scale[scale == 0.0] = 1.0
+
+        self.mean = mean
+        self.scale = scale
+        return self
+
+    ##################################################
+    # 変換する
+    ##################################################
+    def transform(self, base, rows=None, inplace=False):
+        """ 変換する
+
+        Args:
+            base(ndarray)   : 全データの配列(行, 列)
+            rows(ndarray)   : 対象の行のインデックス(Noneの場合は全ての行)
+            inplace(bool)   : baseを直接変換するか否か(rowsがNoneの場合のみ)
+
+        Returns:
+            ndarray : 変換後の配列(float32)
+        """
+        mean = self.mean.astype(np.float32)
+        scale = self.scale.astype(np.float32)
+
+        if inplace and (rows is None) and (base.dtype == np.float32):
+            output = base
+        else:
+            num_rows = len(base) if rows is None else len(rows)
+            output = np.empty((num_rows, base.shape[1]), dtype=np.float32)
+
+        # 一定の行数ごとに変換する
+        for start in range(0, len(output), self._CHUNK_ROWS):
+            out = output[start:start+self._CHUNK_ROWS]
+            np.subtract(self._get_chunk(base, rows, start), mean, out=out)
+            np.divide(out, scale, out=out)
+
+        return output
+
+    ##################################################
+    # 統計量を算出し、変換する
+    ##################################################
+    def fit_transform(self, base, rows=None, inplace=False):
+        return self.fit(base, rows).transform(base, rows, inplace)
+
+    ##################################################
+    # 統計量をファイルに保存する
+    ##################################################
+    def save(self, file_path):
+        """ 統計量をファイルに保存する
+
+        Args:
+            file_path(string)   : ファイルパス(.npz)
+        """
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        np.savez(file_path, mean=self.mean, scale=self.scale)
+
+    ##################################################
+    # 統計量をファイルから読み込む
+    ##################################################
+    @classmethod
+    def load(cls, file_path):
+        """ 統計量をファイルから読み込む
+
+        Args:
+            file_path(string)   : ファイルパス(.npz)
+
+        Returns:
+            Float32Scaler : スケーラ
+        """
+        with np.load(file_path) as data:
+            return cls(data['mean'], data['scale'])
+
+    ##################################################
+    # 一定の行数分のデータを取得する
+    ##################################################
+    def _get_chunk(self, base, rows, start):
+        if rows is None:
+            return base[start:start+self._CHUNK_ROWS]
+        return base[rows[start:start+self._CHUNK_ROWS]]
@@ -0,0 +1,192 @@
+# coding: utf-8
+
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+# スキーマのファイル名
+__SCHEMA_FILENAME = 'schema.pickle'
+
+# 列方向に結合する際に複写しないための引数
+#   (pandas 3以降はCopy-on-Writeにより複写しないため、copy引数は指定しない)
+__CONCAT_NO_COPY = {} if int(pd.__version__.split('.')[0]) >= 3 else {'copy': False}
+
+##################################################
+# DataFrameを型付きのバイナリ形式で保存する
+##################################################
+def save_typed_frame(df, dir_path):
+    """ DataFrameを型付きのバイナリ形式で保存する
+
+        数値・日時の列は型ごとに(列, 行)の配列にまとめて.npyで保存する。
+        文字列(object)・カテゴリの列はカテゴリのコードとカテゴリの一覧で保存する。
+        列名,型,カテゴリの一覧はスキーマのファイルに保存する。
+
+    Args:
+        df(DataFrame)   : 保存するDataFrame
+        dir_path(string): 保存先のディレクトリパス
+    """
+    os.makedirs(dir_path, exist_ok=True)
+    old_schema = _read_schema(dir_path)
+    generation = old_schema['generation'] + 1 if old_schema is not None else 0
+
+    # 列を型ごとのブロックに振り分ける
+    columns = []
+    blocks = {}
+    for i, name in enumerate(df.columns):
+
+        series = df.iloc[:, i]
+        dtype = series.dtype
+        column = {'name': name}
+
+        if isinstance(dtype, pd.CategoricalDtype) or (dtype.kind not in 'biufM'):
+            # 文字列・カテゴリはカテゴリのコードで保存する
+            categorical = series if isinstance(dtype, pd.CategoricalDtype) else series.astype('category')
+            column['kind'] = 'category' if isinstance(dtype, pd.CategoricalDtype) else 'object'
+            column['categories'] = list(categorical.cat.categories)
+            column['ordered'] = categorical.cat.ordered
+            block = 'codes'
+            values = categorical.cat.codes.to_numpy().astype(np.int32)
+        elif dtype.kind == 'M':
+            column['kind'] = 'datetime'
+            block = dtype.name
+            values = series.to_numpy()
+        else:
+            column['kind'] = 'numeric'
+            block = dtype.name
+            values = series.to_numpy()
+
+        column['block'] = block
+        column['pos'] = len(blocks.setdefault(block, []))
+        blocks[block].append(values)
+        columns.append(column)
+
+    # ブロックを書き込む
+    block_files = {}
+    for block, arrays in blocks.items():
+        file_name = '{0:s}.{1:d}.npy'.format(block.replace('[', '_').replace(']', ''), generation)
+        _write_array(os.path.join(dir_path, file_name), np.stack(arrays))
+        block_files[block] = file_name
+
+    # インデックス(既定のRangeIndex以外の場合は配列で保存する)
+    if isinstance(df.index, pd.RangeIndex):
+        index = {'start': df.index.start, 'stop': df.index.stop, 'step': df.index.step}
+    elif df.index.dtype.kind not in 'biufM':
+        index = {'values': list(df.index)}
+    else:
+        index = {'file': 'index.{0:d}.npy'.format(generation)}
+        _write_array(os.path.join(dir_path, index['file']), df.index.to_numpy())
+
+    # スキーマを書き込んだ後に、古い世代のファイルを削除する
+    schema = {'generation': generation, 'columns': columns, 'blocks': block_files, 'index': index}
+    _write_schema(dir_path, schema)
+    if old_schema is not None:
+        old_files = list(old_schema['blocks'].values())
+        if 'file' in old_schema['index']:
+            old_files.append(old_schema['index']['file'])
+        for file_name in old_files:
+            file_path = os.path.join(dir_path, file_name)
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+##################################################
+# 型付きのバイナリ形式で保存したDataFrameを読み込む
+##################################################
+def load_typed_frame(dir_path, mmap=True, read_only=False):
+    """ 型付きのバイナリ形式で保存したDataFrameを読み込む
+
+        数値・日時の列は型ごとのブロックを複写せずにDataFrameにするため、
+        メモリマップで開いた場合は列の値がメモリマップを参照する。
+        (アクセスした行のみがファイルから読み込まれる)
+
+    Args:
+        dir_path(string): 保存先のディレクトリパス
+        mmap(bool)      : メモリマップ(書き込み時コピー)で開くか否か
+        read_only(bool) : 読み取り専用のメモリマップで開くか否か(複数のプロセスでページを共有する)
+
+    Returns:
+        DataFrame : 読み込んだDataFrame
+    """
+    schema = _read_schema(dir_path)
+    if read_only:
+        mmap_mode = 'r'
+    else:
+        mmap_mode = 'c' if mmap else None
+
+    blocks = {
+        block: np.load(os.path.join(dir_path, file_name), mmap_mode=mmap_mode, allow_pickle=False)
+            for block, file_name in schema['blocks'].items()
+    }
+
+    # インデックスを復元する
+    index = schema['index']
+    if 'file' in index:
+        index = pd.Index(np.load(os.path.join(dir_path, index['file']), allow_pickle=False))
+    elif 'values' in index:
+        index = pd.Index(index['values'])
+    else:
+        index = pd.RangeIndex(index['start'], index['stop'], index['step'])
+
+    # ブロックごとの列名(ブロック内の位置の順)
+    block_names = {}
+    for column in sorted(schema['columns'], key=lambda column: column['pos']):
+        block_names.setdefault(column['block'], []).append(column['name'])
+
+    # 数値・日時のブロックは(行, 列)の転置のまま複写せずにDataFrameにする
+    frames = []
+    for block, values in blocks.items():
+        if block != 'codes':
+            frames.append(pd.DataFrame(values.T, index=index, columns=block_names[block], copy=False))
+
+    # 文字列・カテゴリの列を復元する
+    data = {}
+    for column in schema['columns']:
+        if column['kind'] in ('category', 'object'):
+            values = pd.Categorical.from_codes(
+                blocks['codes'][column['pos']], categories=column['categories'], ordered=column['ordered'])
+            if column['kind'] == 'object':
+                values = np.asarray(values, dtype=object)
+            data[column['name']] = values
+    if len(data) > 0:
+        frames.append(pd.DataFrame(data, index=index))
+
+    if len(frames) == 0:
+        return pd.DataFrame(index=index)
+
+    # ブロックを列方向に結合し、保存時の列の並びに戻す
+    df = pd.concat(frames, axis=1, **__CONCAT_NO_COPY)
+    return df[[column['name'] for column in schema['columns']]]
+
+##################################################
+# 型付きのバイナリ形式のDataFrameが保存済みか否か
+##################################################
+def exists_typed_frame(dir_path):
+    return os.path.isfile(os.path.join(dir_path, __SCHEMA_FILENAME))
+
+##################################################
+# 配列を書き込む
+##################################################
+def _write_array(file_path, array):
+    temp_path = '{0:s}.tmp.npy'.format(file_path)
+    np.save(temp_path, np.ascontiguousarray(array), allow_pickle=False)
+    os.replace(temp_path, file_path)
+
+##################################################
+# スキーマを読み込む
+##################################################
+def _read_schema(dir_path):
+    schema_path = os.path.join(dir_path, __SCHEMA_FILENAME)
+    if not os.path.isfile(schema_path):
+        return None
+    with open(schema_path, 'rb') as f:
+        return pickle.load(f)
+
+##################################################
+# スキーマを書き込む
+##################################################
+def _write_schema(dir_path, schema):
+    schema_path = os.path.join(dir_path, __SCHEMA_FILENAME)
+    temp_path = '{0:s}.tmp'.format(schema_path)
+    with open(temp_path, 'wb') as f:
+        pickle.dump(schema, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, schema_path)
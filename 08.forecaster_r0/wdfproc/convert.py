@@ -132,7 +132,7 @@ def convert_symbol_to_number(df, inplace=True):
     else:
         new_df = df.copy()
 
-    # 天気記号を数値に変換する
+    # 天気記号を数値に変換する関数
     def to_number(element):
         if type(element) is str:
             if ')' in element:
@@ -147,9 +147,11 @@ def convert_symbol_to_number(df, inplace=True):
             
         return value
 
-    # 天気を数値に変換する
-    for col in df.columns:
-        new_df[col] = new_df[col].map(lambda element : to_number(element))
+    # 天気を数値に変換する(文字列の列のみ対象, 値の種類ごとに1回だけ変換する)
+    for col in _get_string_columns(new_df, new_df.columns):
+        codes, uniques = pd.factorize(new_df[col])
+        lookup = np.array([to_number(unique) for unique in uniques] + [np.nan], dtype=object)
+        new_df[col] = lookup[codes]
     
     return new_df
 
@@ -172,48 +174,26 @@ def convert_wind_to_vector_ground(df, inplace=True):
     else:
         new_df = df.copy()
     
-    # 風向きを数値に変換する関数
-    def to_angle(wind_direction):
-        angle = 0.0
-        if wind_direction in __WIND_DIRECTION_TO_ANGLE_MAP:
-            angle = __WIND_DIRECTION_TO_ANGLE_MAP[wind_direction]
-        else:
-            anble = 0.0
-        return angle
-
-    # 風向きを数値に変換する
+    # 風向き・風速の列(地点ごと)
     wind_dir_cols = [col for col in new_df.columns if('風向' in col)]
-    for col in wind_dir_cols:
-        new_col = col + '(角度)'
-        new_df[new_col] = new_df[col].map(lambda col : to_angle(col))
+    wind_speed_cols = [col for col in new_df.columns if('風速' in col)]
+    place_names = [re.search(r"(\D+)_風向", col).group(1) for col in wind_dir_cols]
+    speed_cols = [place_name + '_' + '風速(m/s)' for place_name in place_names]
+
+    # 全地点の風向きをまとめて数値に変換する
+    wind_dirs = new_df[wind_dir_cols].to_numpy(dtype=object)
+    angles = _lookup_values(wind_dirs.ravel(), __WIND_DIRECTION_TO_ANGLE_MAP, 0.0)
+    angles = angles.reshape(wind_dirs.shape)
 
     # 風速のうち無効なデータを0に補正する
-    wind_speed_cols = [col for col in new_df.columns if('風速' in col)]
-    for col in wind_speed_cols:
-        if df[col].dtype == object:
-            new_df.replace({col: {'×': 0.0}}, inplace=True)
-            new_df.replace({col: {'--': 0.0}}, inplace=True)
-
-    # 風向き・風速を、X,Y方向の風速に変換する
-    wind_angle_cols = [col for col in new_df.columns if('風向(角度)' in col)]
-    for angle_col in wind_angle_cols:
-        result = re.search(r"(\D+)_風向\(角度\)", angle_col)
-        place_name = result.group(1)
-        speed_col = place_name + '_' + '風速(m/s)'
-        new_df = new_df.astype({speed_col: float})
-
-        wind_x_col = place_name + '_' + '風速(m/s)_X'
-        wind_y_col = place_name + '_' + '風速(m/s)_Y'
-        new_df[wind_x_col] = new_df[speed_col] * np.cos(df[angle_col])
-        new_df[wind_y_col] = new_df[speed_col] * np.sin(df[angle_col])
-
-        # 新しく追加した列の小数点を丸める
-        new_df = new_df.round({wind_x_col: 3, wind_y_col: 3})
-
-    # 元の風向き・風速を削除する
-    new_df = new_df.drop(columns=wind_dir_cols)
-    new_df = new_df.drop(columns=wind_speed_cols)
-    new_df = new_df.drop(columns=wind_angle_cols)
+    speeds = _get_wind_speeds(new_df, speed_cols, ['×', '--'])
+
+    # 風向き・風速を、全地点まとめてX,Y方向の風速に変換する
+    vector_df = _get_wind_vectors(place_names, speeds, angles, new_df.index)
+
+    # 元の風向き・風速を削除し、X,Y方向の風速を追加する
+    new_df = new_df.drop(columns=wind_dir_cols + wind_speed_cols)
+    new_df = pd.concat([new_df, vector_df], axis=1)
 
     return new_df
     
@@ -235,19 +215,10 @@ def convert_weather_to_interger(df, inplace=True):
     else:
         new_df = df.copy()
 
-    # 天気を整数値に変換する関数
-    def to_integer(name):
-        value = 0
-        if name in __WEATHER_TO_INT_MAP:
-            value = __WEATHER_TO_INT_MAP[name]
-        else:
-            value = 0
-        return value
-
-    # 天気を整数値に変換する
+    # 天気を整数値に変換する(変換表に無い天気は0とする)
     weather_cols = [col for col in new_df.columns if('天気' in col)]
     for col in weather_cols:
-        new_df[col] = new_df[col].map(lambda col : to_integer(col))
+        new_df[col] = _lookup_values(new_df[col], __WEATHER_TO_INT_MAP, 0)
     
     return new_df
 
@@ -269,19 +240,10 @@ def convert_cloud_volume_to_float(df, inplace=True):
     else:
         new_df = df.copy()
     
-    # 雲量を浮動小数点数に変換する
-    def to_float(name):
-        value = 0.0
-        if name in __CLOUD_VOLUME_TO_FLOAT_MAP:
-            value = __CLOUD_VOLUME_TO_FLOAT_MAP[name]
-        else:
-            value = 0.0
-        return value
-
-    # 天気を整数値に変換する
+    # 雲量を浮動小数点数に変換する(変換表に無い雲量は0.0とする)
     cloud_volume_cols = [col for col in new_df.columns if('雲量' in col)]
     for col in cloud_volume_cols:
-        new_df[col] = new_df[col].map(lambda col : to_float(col))
+        new_df[col] = _lookup_values(new_df[col], __CLOUD_VOLUME_TO_FLOAT_MAP, 0.0)
     
     return new_df
 
@@ -400,45 +362,113 @@ def convert_wind_to_vector_highrise(df, inplace=True):
     else:
         new_df = df.copy()
     
-    # 風向きを度数(°)からラジアンに変換する関数
-    def to_radian(wind_deg):
-        radian = (-wind_deg + 270)/180 * math.pi
-        return radian
-    
-    wind_radian_cols = []
-    
-    # 風向きを度数(°)からラジアンに変換する
+    # 風向き・風速の列(指定気圧面ごと)
     wind_dir_cols = [col for col in new_df.columns if('風向' in col)]
-    for col in wind_dir_cols:
-        new_col = col + '(rad)'
-        new_df[new_col] = new_df[col].map(lambda col : to_radian(col))
-        wind_radian_cols.append(new_col)
+    wind_speed_cols = [col for col in new_df.columns if('風速' in col)]
+    prifixes = [re.search(r"(.+)_風向", col).group(1) for col in wind_dir_cols]
+    speed_cols = [prifix + '_' + '風速(m/s)' for prifix in prifixes]
+
+    # 全指定気圧面の風向きをまとめて度数(°)からラジアンに変換する
+    radians = (-new_df[wind_dir_cols].to_numpy(dtype=np.float64) + 270)/180 * math.pi
 
     # 風速のうち無効なデータを0に補正する
-    wind_speed_cols = [col for col in new_df.columns if('風速' in col)]
-    for col in wind_speed_cols:
-        if df[col].dtype == object:
-            new_df.replace({col: ['−', '静穏']}, 0.0, inplace=True)
-
-    # 風向き・風速を、X,Y方向の風速に変換する
-    for radian_col in wind_radian_cols:
-        result = re.search(r"(.+)_風向.*\(rad\)", radian_col)
-        prifix = result.group(1)
-        speed_col = prifix + '_' + '風速(m/s)'
-        new_df = new_df.astype({speed_col: float})
-        
-        wind_x_col = prifix + '_' + '風速(m/s)_X'
-        wind_y_col = prifix + '_' + '風速(m/s)_Y'
-        new_df[wind_x_col] = new_df[speed_col] * np.cos(df[radian_col])
-        new_df[wind_y_col] = new_df[speed_col] * np.sin(df[radian_col])
+    speeds = _get_wind_speeds(new_df, speed_cols, ['−', '静穏'])
 
-        # 新しく追加した列の小数点を丸める
-        new_df = new_df.round({wind_x_col: 3, wind_y_col: 3})
+    # 風向き・風速を、全指定気圧面まとめてX,Y方向の風速に変換する
+    vector_df = _get_wind_vectors(prifixes, speeds, radians, new_df.index)
 
-    # 元の風向き・風速を削除する
-    new_df = new_df.drop(columns=wind_dir_cols)
-    new_df = new_df.drop(columns=wind_speed_cols)
-    new_df = new_df.drop(columns=wind_radian_cols)
+    # 元の風向き・風速を削除し、X,Y方向の風速を追加する
+    new_df = new_df.drop(columns=wind_dir_cols + wind_speed_cols)
+    new_df = pd.concat([new_df, vector_df], axis=1)
 
     return new_df
-    
\ No newline at end of file
+
+##################################################
+# 文字列の列を取得する
+##################################################
+def _get_string_columns(df, columns):
+    """ 文字列の列(object型,文字列型)を取得する
+
+    Args:
+        df(DataFrame)   : 対象のDataFrame
+        columns(List)   : 対象の列名
+
+    Returns:
+        list : 文字列の列名のリスト
+    """
+    string_columns = []
+    for col in columns:
+        dtype = df[col].dtype
+        if (dtype == object) or isinstance(dtype, pd.StringDtype):
+            string_columns.append(col)
+    
+    return string_columns
+
+##################################################
+# 風速を取得する
+##################################################
+def _get_wind_speeds(df, speed_cols, invalid_values):
+    """ 風速を取得する(無効なデータは0に補正する)
+
+    Args:
+        df(DataFrame)       : 対象のDataFrame
+        speed_cols(List)    : 風速の列名
+        invalid_values(List): 無効なデータ
+
+    Returns:
+        ndarray : 風速(行, 列)
+    """
+    speed_df = df[speed_cols]
+    string_cols = _get_string_columns(speed_df, speed_cols)
+    if len(string_cols) > 0:
+        speed_df = speed_df.mask(speed_df.isin(invalid_values), 0.0)
+    
+    return speed_df.to_numpy(dtype=np.float64)
+
+##################################################
+# 風向き・風速をX,Y方向の風速に変換する
+##################################################
+def _get_wind_vectors(prifixes, speeds, angles, index):
+    """ 風向き・風速をX,Y方向の風速に変換する
+
+    Args:
+        prifixes(List)  : 列名のPrefix(地点名等)
+        speeds(ndarray) : 風速(行, 列)
+        angles(ndarray) : 風向き[rad](行, 列)
+        index(Index)    : 行のインデックス
+
+    Returns:
+        DataFrame : X,Y方向の風速(列の並びは X, Y の順で交互)
+    """
+    vectors = np.empty((speeds.shape[0], speeds.shape[1] * 2), dtype=np.float64)
+    vectors[:, 0::2] = np.round(speeds * np.cos(angles), 3)
+    vectors[:, 1::2] = np.round(speeds * np.sin(angles), 3)
+
+    columns = []
+    for prifix in prifixes:
+        columns.append(prifix + '_' + '風速(m/s)_X')
+        columns.append(prifix + '_' + '風速(m/s)_Y')
+
+    return pd.DataFrame(vectors, columns=columns, index=index)
+
+##################################################
+# 変換表で値を一括変換する
+##################################################
+def _lookup_values(values, table, default):
+    """ 変換表で値を一括変換する
+        (値の種類ごとに1回だけ変換表を参照し、コードから配列で引く)
+
+    Args:
+        values(Series, ndarray) : 対象の値
+        table(Dict)             : 変換表
+        default(object)         : 変換表に無い値(欠損値を含む)の変換後の値
+
+    Returns:
+        ndarray : 変換後の値
+    """
+    codes, uniques = pd.factorize(values)
+    
+    # 末尾に既定値を追加する(欠損値のコード-1で参照される)
+    lookup = np.array([table.get(unique, default) for unique in uniques] + [default])
+    
+    return lookup[codes]
@@ -6,18 +6,21 @@ import wdfproc
 import util
 
 import os
+import pickle
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from . import read_csv
 from . import name_handle
 
 ##################################################
 # 1地点の地上気象データを取得する
 ##################################################
-def get_ground_weather_one_place(dir_path):
+def get_ground_weather_one_place(dir_path, workers=1):
     """ 1地点の地上気象データを取得する
     
     Args:
-        dir_path(string) : ディレクトリパス
+        dir_path(string)    : ディレクトリパス
+        workers(int)        : ワーカー数(Noneの場合はCPU数, 1の場合は並列化しない)
 
     Returns:
         DataFrame : ファイルの読込結果
@@ -26,22 +29,8 @@ def get_ground_weather_one_place(dir_path):
     # 地上気象データのファイル一覧取得
     file_paths = util.get_file_paths(dir_path)
 
-    # 気象データを読み込み、DataFrameに格納する
-    ground_df = None
-    for file_path in file_paths:
-        
-        # 地上気象データ読み込み
-        df = read_csv.read_ground(file_path)
-        
-        # 指定した行のデータを抽出
-        #df1 = wdfproc.extract_row_isin(df, ('時', '時'), [9, 21])
-        df1 = df
-        
-        # DataFrameに追加する
-        if ground_df is None:
-            ground_df = df1
-        else:
-            ground_df = ground_df.append(df1)
+    # 気象データを読み込み、1度だけ結合する
+    ground_df = pd.concat(_read_ground_files(file_paths, workers, _get_ground_schema(file_paths)))
     
     # 地点名を取得する
     dirname = os.path.basename(dir_path)
@@ -56,36 +45,247 @@ def get_ground_weather_one_place(dir_path):
 ##################################################
 # 複数地点の地上気象データを取得する
 ##################################################
-def get_ground_weather(input_dir):
+def get_ground_weather(input_dir, workers=None):
     """ 複数地点の地上気象データを取得する
+        
+        全地点のファイルをプロセスプールで並列に読み込み、地点ごとに1度だけ結合する。
+        全地点のデータは(日付,時)をキーに1度で結合する。
     
     Args:
-        input_dir(string) : ディレクトリパス
+        input_dir(string)   : ディレクトリパス
+        workers(int)        : ワーカー数(Noneの場合はCPU数, 1の場合は並列化しない)
 
     Returns:
         DataFrame : ファイルの読込結果
     """
     
-    # 地上の気象データが格納されたディレクトリの一覧を取得し、
-    # 順番にDataFrameに格納していく
-    ground_df = None
-    for dir_name in os.listdir(input_dir):
+    # 地上の気象データが格納されたディレクトリと、ファイルの一覧を取得する
+    dir_names = os.listdir(input_dir)
+    file_paths = [util.get_file_paths(os.path.join(input_dir, dir_name)) for dir_name in dir_names]
+    
+    # 全地点のファイルをまとめて並列に読み込む(ファイルのスキーマは地点ごとに1回だけ取得する)
+    schemas = [_get_ground_schema(paths) for paths in file_paths]
+    dfs = _read_ground_files(
+        [path for paths in file_paths for path in paths], workers,
+        [schema for paths, schema in zip(file_paths, schemas) for path in paths])
+    
+    # 地点ごとに結合し、列名を変更する
+    place_dfs = []
+    offset = 0
+    for dir_name, paths in zip(dir_names, file_paths):
         
-        # 1地点の地上気象データを取得する
-        dir_path = os.path.join(input_dir, dir_name)
-        df = get_ground_weather_one_place(dir_path)
+        df = pd.concat(dfs[offset:offset + len(paths)])
+        offset += len(paths)
         
-        # 気象データを結合する
-        if ground_df is None:
-            ground_df = df
-        else:
+        elements = name_handle.elements_from_dirname_ground(dir_name)
+        place_dfs.append(wdfproc.rename_column_ground(df, elements['name']))
+    
+    # 気象データを結合する
+    ground_df = _join_ground_weather(place_dfs)
+    
+    # 日付と時の列を先頭に移動する
+    ground_df = util.move_datetime_column_to_top(ground_df)
+    
+    return ground_df
+
+##################################################
+# 地上気象データのファイルを読み込む
+##################################################
+def _read_ground_files(file_paths, workers, schemas=None):
+    """ 地上気象データのファイルを読み込む
+        (CSVの解析はCPUが主体のため、プロセスプールで並列に読み込む)
+    
+    Args:
+        file_paths(list[string])    : ファイルパスのリスト
+        workers(int)                : ワーカー数(Noneの場合はCPU数, 1の場合は並列化しない)
+        schemas(dict or list[dict]) : ファイルのスキーマ(ファイルごとのリスト, またはすべてのファイルで共通)
+
+    Returns:
+        list[DataFrame] : ファイルの読込結果(ファイルパスの順)
+    """
+    if (schemas is None) or isinstance(schemas, dict):
+        schemas = [schemas] * len(file_paths)
+    
+    if (workers == 1) or (len(file_paths) <= 1):
+        return [_read_ground_file(file_path, schema) for file_path, schema in zip(file_paths, schemas)]
+    
+    # ワーカーごとにまとめてファイルを渡す
+    num_workers = workers if workers is not None else (os.cpu_count() or 1)
+    chunksize = max(1, len(file_paths) // (num_workers * 4))
+    
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(_read_ground_file, file_paths, schemas, chunksize=chunksize))
+
+##################################################
+# 地上気象データのファイルを1つ読み込む
+##################################################
+def _read_ground_file(file_path, schema):
+    if schema is None:
+        return read_csv.read_ground(file_path)
+    return read_csv.read_ground_with_schema(file_path, schema)
+
+##################################################
+# 地上気象データのファイルのスキーマを取得する
+##################################################
+def _get_ground_schema(file_paths):
+    if len(file_paths) == 0:
+        return None
+    return read_csv.get_ground_schema(file_paths[0])
+
+##################################################
+# 複数地点の地上気象データを結合する
+##################################################
+def _join_ground_weather(dfs):
+    """ 複数地点の地上気象データを(日付,時)をキーに1度で結合する
+        ((日付,時)が重複する地点がある場合は、pd.mergeで順番に結合する)
+    
+    Args:
+        dfs(list[DataFrame]) : 地点ごとの地上気象データ
+
+    Returns:
+        DataFrame : 結合後の地上気象データ
+    """
+    if len(dfs) == 1:
+        return dfs[0]
+    
+    # (日付,時)が重複する場合はインデックスで結合できないため、pd.mergeで結合する
+    indexed_dfs = [df.set_index(['日付', '時']) for df in dfs]
+    duplicated = [i for i, df in enumerate(indexed_dfs) if not df.index.is_unique]
+    if len(duplicated) > 0:
+        for i in duplicated:
+            index = indexed_dfs[i].index
+            print('duplicated (日付, 時) in {0:s}, ...: {1:s} (joined with pd.merge)'.format(
+                str(indexed_dfs[i].columns[0]), ', '.join(map(str, index[index.duplicated()].unique()[:5]))))
+        ground_df = dfs[0]
+        for df in dfs[1:]:
             ground_df = pd.merge(ground_df, df, on=('日付','時'))
+        return ground_df
+    
+    ground_df = pd.concat(indexed_dfs, axis=1, join='inner')
+    
+    return ground_df.reset_index()
+
+##################################################
+# 複数地点の地上気象データを取得する(差分更新)
+##################################################
+def update_ground_weather(input_dir, cache_dir, reload=False, workers=None):
+    """ 複数地点の地上気象データを取得する(差分更新)
+        
+        地点ごとに読み込み済みのデータとファイルの状態を保存しておき、
+        新規・更新されたファイルのみを読み込んで追加する。
+        読み込み済みのデータは型付きのバイナリ形式(util.save_typed_frame)で保存する。
+    
+    Args:
+        input_dir(string)   : ディレクトリパス
+        cache_dir(string)   : 読み込み済みのデータを保存するディレクトリパス
+        reload(bool)        : 全ファイルを読み込み直すか否か
+        workers(int)        : ワーカー数(Noneの場合はCPU数, 1の場合は並列化しない)
+
+    Returns:
+        DataFrame : ファイルの読込結果
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    dir_names = os.listdir(input_dir)
+    
+    # 地点ごとに新規・更新されたファイルを読み込む
+    updated = False
+    for dir_name in dir_names:
+        dir_path = os.path.join(input_dir, dir_name)
+        if _update_ground_weather_one_place(dir_path, os.path.join(cache_dir, dir_name), reload, workers):
+            updated = True
+    
+    # 更新が無い場合は、結合済みのデータを読み込む
+    merged_dir = os.path.join(cache_dir, 'merged')
+    merged_files = '{0:s}.files.pickle'.format(merged_dir)
+    if (updated == False) and util.exists_typed_frame(merged_dir) and os.path.isfile(merged_files):
+        with open(merged_files, 'rb') as f:
+            if pickle.load(f) == dir_names:
+                return util.load_typed_frame(merged_dir)
+    
+    # 地点ごとの気象データを(日付,時)をキーに1度で結合する
+    ground_df = _join_ground_weather([
+        util.load_typed_frame(os.path.join(cache_dir, dir_name)) for dir_name in dir_names])
     
     # 日付と時の列を先頭に移動する
     ground_df = util.move_datetime_column_to_top(ground_df)
     
+    # 結合済みのデータを保存する
+    util.save_typed_frame(ground_df, merged_dir)
+    _write_pickle(dir_names, merged_files)
+    
     return ground_df
 
+##################################################
+# 1地点の地上気象データを更新する(差分更新)
+##################################################
+def _update_ground_weather_one_place(dir_path, cache_dir, reload, workers):
+    """ 1地点の地上気象データを更新する(差分更新)
+    
+    Args:
+        dir_path(string)    : ディレクトリパス
+        cache_dir(string)   : 読み込み済みのデータを保存するディレクトリパス
+        reload(bool)        : 全ファイルを読み込み直すか否か
+        workers(int)        : ワーカー数
+
+    Returns:
+        bool : 更新したか否か
+    """
+    
+    # 地上気象データのファイルの状態(サイズ,更新日時)を取得する
+    file_paths = util.get_file_paths(dir_path)
+    files = {path: (size, mtime) for path, size, mtime in util.get_files_fingerprint(file_paths)}
+    
+    # 読み込み済みのファイルの状態を読み込む
+    #   (リロード有り、または、削除されたファイルがある場合は全ファイルを読み込む)
+    files_path = '{0:s}.files.pickle'.format(cache_dir)
+    cached_files = None
+    if (reload == False) and os.path.isfile(files_path) and util.exists_typed_frame(cache_dir):
+        with open(files_path, 'rb') as f:
+            cached_files = pickle.load(f)
+        if len(set(cached_files.keys()) - set(files.keys())) > 0:
+            cached_files = None
+    
+    if cached_files is None:
+        new_files = list(files.keys())
+    else:
+        new_files = [path for path, state in files.items() if cached_files.get(path) != state]
+    
+    if len(new_files) == 0:
+        return False
+    
+    # 新規・更新されたファイルを読み込む
+    new_df = pd.concat(_read_ground_files(new_files, workers, _get_ground_schema(new_files)))
+    
+    # 地点名を取得し、列名を変更する
+    dirname = os.path.basename(dir_path)
+    elements = name_handle.elements_from_dirname_ground(dirname)
+    new_df = wdfproc.rename_column_ground(new_df, elements['name'])
+    
+    # 同じ日付・時刻の行を置き換える
+    if cached_files is not None:
+        ground_df = util.load_typed_frame(cache_dir, mmap=False)
+        keep = ~pd.MultiIndex.from_frame(ground_df[['日付', '時']]).isin(
+                    pd.MultiIndex.from_frame(new_df[['日付', '時']]))
+        new_df = pd.concat([ground_df[keep], new_df[ground_df.columns]])
+    
+    # 差分更新と全ファイルの読み込みで同じ並びになるように、日付・時刻の順に並べる
+    new_df = new_df.sort_values(['日付', '時'], kind='mergesort').reset_index(drop=True)
+    
+    # 読み込み済みのデータとファイルの状態を保存する
+    util.save_typed_frame(new_df, cache_dir)
+    _write_pickle(files, files_path)
+    
+    return True
+
+##################################################
+# pickleファイルを書き込む
+##################################################
+def _write_pickle(obj, file_path):
+    temp_path = '{0:s}.tmp'.format(file_path)
+    with open(temp_path, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, file_path)
+
 ##################################################
 # 1地点の高層気象データを取得する
 ##################################################
@@ -103,58 +303,34 @@ def get_highrise_weather_one_place(dir_path, boundary_pressure=350):
     # 高層気象データのファイル一覧取得
     file_paths = util.get_file_paths(dir_path)
 
-    # 気象データを読み込み、DataFrameに格納する
-    highrise_df = None
+    # 気象データを読み込み、1つの縦長のDataFrameに結合する
+    #   (指定した気圧(hPa)より大きい指定気圧面のデータを抽出する)
+    dfs = []
     for file_path in file_paths:
-            
-        # 高層気象データ読み込み
         df = read_csv.read_highrise(file_path)
-        
-        # 指定した気圧(hPa)より大きい指定気圧面のデータを抽出する
-        df = df[df['気圧(hPa)'] > boundary_pressure]
-
-        # 日付と時刻データを抽出する
-        date = df.loc[1,'日付']
-        hour = df.loc[1,'時']
-
-        # 新しい列名のPrefixを作成する
-        new_column_prefix = []
-        new_column_prefix.append('地上_')
-        for i in range(1, len(df)):
-            prefix = '{0:.0f}hPa_'.format(df.loc[i,'気圧(hPa)'])
-            new_column_prefix.append(prefix)
-                
-        # 新しい列名を作成する
-        #   ex) 1000hPa_高度(m)
-        new_columns = []
-        for col in df.columns:
-            # '日付','時', '気圧(hPa)'を除いた列を扱う
-            if col not in ('日付', '時', '気圧(hPa)'):
-                for prefix in new_column_prefix:
-                    new_column = prefix + col
-                    new_columns.append(new_column)
-        
-        # 複数列のデータを1列のデータに展開する
-        new_values = []
-        for col in df.columns:
-            if col not in ('日付', '時', '気圧(hPa)'):
-                new_values.extend(df[col].tolist())
-        
-        # 新しいDataFrameを作成する
-        df = pd.DataFrame(new_values, index=new_columns)
-        
-        # 1列のDataFrameから1行のDataFrameに変換する
-        df = df.T
-        
-        # 日付と時刻をDataFrameに追加する
-        df['日付'] = date
-        df['時'] = hour
-
-        # DataFrameに追加する
-        if highrise_df is None:
-            highrise_df = df
-        else:
-            highrise_df = highrise_df.append(df)
+        dfs.append(df[df['気圧(hPa)'] > boundary_pressure])
+    long_df = pd.concat(dfs, keys=range(len(dfs)), names=['ファイル', None])
+    file_no = long_df.index.get_level_values('ファイル')
+    
+    # 各ファイルの先頭行は'地上', 以降は指定気圧面を層の名称とする
+    #   ex) 地上, 1000hPa, 925hPa, ...
+    layers = long_df['気圧(hPa)'].map('{0:.0f}hPa'.format).to_numpy(dtype=object)
+    layers[long_df.groupby(level='ファイル').cumcount().to_numpy() == 0] = '地上'
+    layers = pd.Categorical(layers, categories=pd.unique(layers))
+    
+    # (層 × 物理量)を1度に横持ちに変換する
+    #   ex) 1000hPa_高度(m)
+    value_columns = [col for col in long_df.columns if col not in ('日付', '時', '気圧(hPa)')]
+    values_df = long_df[value_columns]
+    values_df.index = pd.MultiIndex.from_arrays([file_no, layers], names=['ファイル', '層'])
+    highrise_df = values_df.unstack('層')
+    highrise_df = highrise_df.reindex(columns=pd.MultiIndex.from_product(
+        [value_columns, layers.categories]))
+    highrise_df.columns = [layer + '_' + col for col, layer in highrise_df.columns]
+    
+    # 日付と時刻をDataFrameに追加する
+    datetime_df = long_df[['日付', '時']].groupby(level='ファイル').first()
+    highrise_df = pd.concat([highrise_df, datetime_df], axis=1).reset_index(drop=True)
     
     # 地点名を取得する
     dirname = os.path.basename(dir_path)
@@ -2,6 +2,20 @@
 
 import re
 
+# ファイル名のパターン(地上気象データ用)
+#   (ex)'Mito_40_47629_2019_1_1.csv'
+__FILENAME_GROUND_PATTERN = re.compile(r"(\D+)_(\d+)_(\d+)_(\d+)_(\d+)_(\d+).csv")
+
+# ディレクトリ名のパターン(地上気象データ用)
+#   (ex)'Mito_40_47629'
+__DIRNAME_GROUND_PATTERN = re.compile(r"(\D+)_(\d+)_(\d+)")
+
+# ファイル名のパターン(高層気象データ用)
+__FILENAME_HIGHRISE_PATTERN = re.compile(r"(\D+)_(\d+)_(\d+)_(\d+)_(\d+)_H(\d+).csv")
+
+# ディレクトリ名のパターン(高層気象データ用)
+__DIRNAME_HIGHRISE_PATTERN = re.compile(r"(\D+)_(\d+)")
+
 ##################################################
 # ファイル名から要素を取得する(地上気象データ用)
 ##################################################
@@ -14,7 +28,7 @@ def elements_from_filename_ground(filename):
     Returns:
         list[string] : 要素のリスト
     """
-    result = re.search(r"(\D+)_(\d+)_(\d+)_(\d+)_(\d+)_(\d+).csv", filename)
+    result = __FILENAME_GROUND_PATTERN.search(filename)
     values = result.groups()
     elements = {
         'name'      : values[0], 
@@ -39,7 +53,7 @@ def elements_from_dirname_ground(dirname):
     Returns:
         dict : 要素のディクショナリ
     """
-    result = re.search(r"(\D+)_(\d+)_(\d+)", dirname)
+    result = __DIRNAME_GROUND_PATTERN.search(dirname)
     values = result.groups()
     
     elements = {
@@ -62,7 +76,7 @@ def elements_from_filename_highrise(filename):
     Returns:
         list[string] : 要素のリスト
     """
-    result = re.search(r"(\D+)_(\d+)_(\d+)_(\d+)_(\d+)_H(\d+).csv", filename)
+    result = __FILENAME_HIGHRISE_PATTERN.search(filename)
     values = result.groups()
     elements = {
         'name'      : values[0], 
@@ -87,7 +101,7 @@ def elements_from_dirname_highrise(dirname):
     Returns:
         dict : 要素のディクショナリ
     """
-    result = re.search(r"(\D+)_(\d+)", dirname)
+    result = __DIRNAME_HIGHRISE_PATTERN.search(dirname)
     values = result.groups()
     
     elements = {
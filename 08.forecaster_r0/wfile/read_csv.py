@@ -1,11 +1,19 @@
 # coding: utf-8
 
 import os
+import csv
+import numpy as np
 import pandas as pd
 import re
 import datetime
 from . import name_handle
 
+# 欠損値とみなす文字列(pandas.read_csvの既定値と同じ)
+__NA_VALUES = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', 
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null', 
+}
+
 ##################################################
 # CSVファイルから地上の気象データを読み込み、
 # DataFrameを返す
@@ -41,6 +49,159 @@ def read_ground(file_path):
     
     return df
 
+##################################################
+# 地上の気象データのCSVファイルのスキーマを取得する
+##################################################
+def get_ground_schema(file_path):
+    """ 地上の気象データのCSVファイルのスキーマを取得する
+        (同じ地点のファイルは同じ構成のため、地点ごとに1回だけ取得する)
+    
+    Args:
+        file_path    (string) : ファイルパス
+
+    Returns:
+        dict : スキーマ
+            header      : ヘッダー(2行)
+            columns     : 列名(日付の列を含む)
+            converters  : 列ごとの変換方法(先頭はインデックスの列) 'int', 'float', 'object'
+    """
+    with open(file_path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = (next(reader), next(reader))
+        rows = list(reader)
+    
+    # 先頭の列はインデックスのため除き、末尾に日付の列を追加する
+    columns = list(zip(header[0][1:], header[1][1:])) + [('日付','日付')]
+    
+    # 1つ目のファイルの値から、列ごとの変換方法を決める
+    if len(rows) > 0:
+        converters = [_get_converter(column_values) for column_values in zip(*rows)]
+    else:
+        converters = ['object'] * len(header[0])
+    
+    return {'header': header, 'columns': pd.MultiIndex.from_tuples(columns), 'converters': converters}
+
+##################################################
+# スキーマを使ってCSVファイルから地上の気象データを読み込む
+##################################################
+def read_ground_with_schema(file_path, schema):
+    """ スキーマを使ってCSVファイルから地上の気象データを読み込み、
+        DataFrameを返す
+        
+        ヘッダーの解析を省き、スキーマの列ごとの変換方法で値を変換する。
+        (ヘッダーがスキーマと異なる場合はread_groundで読み込む)
+    
+    Args:
+        file_path    (string) : ファイルパス
+        schema       (dict)   : get_ground_schemaで取得したスキーマ
+
+    Returns:
+        DataFrame : ファイルの読込結果
+    """
+    
+    # CSVファイル読み込み
+    with open(file_path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = (next(reader, None), next(reader, None))
+        rows = list(reader)
+    
+    if (header != schema['header']) or (len(rows) == 0):
+        return read_ground(file_path)
+    
+    # ファイル名から地点名、日付を抽出
+    file_name = os.path.basename(file_path)
+    elements = name_handle.elements_from_filename_ground(file_name)
+    year = elements['year']
+    month = elements['month']
+    day = elements['day']
+    date = datetime.datetime(year, month, day)
+    
+    # 列ごとに値を変換し、末尾に日付を追加する(先頭の列はインデックス)
+    values = list(zip(*rows))
+    converters = schema.get('converters') or ['object'] * len(values)
+    arrays = [_convert_values_with(converter, column_values) 
+                for converter, column_values in zip(converters, values)]
+    index = pd.Index(arrays.pop(0))
+    arrays.append(np.full(len(rows), np.datetime64(date, 'ns')))
+    
+    df = pd.DataFrame(dict(enumerate(arrays)), index=index)
+    df.columns = schema['columns']
+    
+    return df
+
+##################################################
+# 列の変換方法を決める
+##################################################
+def _get_converter(values):
+    """ 列の変換方法を決める
+    
+    Args:
+        values(tuple[string]) : 文字列の値
+
+    Returns:
+        string : 変換方法 'int', 'float', 'object'
+    """
+    kind = _convert_values(values).dtype.kind
+    if kind == 'i':
+        return 'int'
+    elif kind == 'f':
+        return 'float'
+    return 'object'
+
+##################################################
+# 変換方法を指定して文字列の値を変換する
+##################################################
+def _convert_values_with(converter, values):
+    """ 変換方法を指定して文字列の値を変換する
+        (変換できない場合、および、文字列の列は型を推定して変換する)
+        
+        文字列の列は、日によって数値のみになる場合があるため(ex)雲量の'10-'
+        pandas.read_csvと同じ結果になるように常に型を推定する。
+    
+    Args:
+        converter(string)     : 変換方法 'int', 'float', 'object'
+        values(tuple[string]) : 文字列の値
+
+    Returns:
+        ndarray : 変換後の値
+    """
+    try:
+        if converter == 'int':
+            return np.array([int(value) for value in values], dtype=np.int64)
+        elif converter == 'float':
+            return np.array([np.nan if value in __NA_VALUES else float(value) for value in values], 
+                            dtype=np.float64)
+    except ValueError:
+        pass
+    
+    return _convert_values(values)
+
+##################################################
+# 文字列の値を変換する
+##################################################
+def _convert_values(values):
+    """ 文字列の値を変換する
+        (pandas.read_csvの型の推定と同じく、整数 -> 浮動小数点数 -> 文字列の順に試す)
+    
+    Args:
+        values(tuple[string]) : 文字列の値
+
+    Returns:
+        ndarray : 変換後の値
+    """
+    try:
+        return np.array([int(value) for value in values], dtype=np.int64)
+    except ValueError:
+        pass
+    
+    try:
+        return np.array([np.nan if value in __NA_VALUES else float(value) for value in values], 
+                        dtype=np.float64)
+    except ValueError:
+        pass
+    
+    return np.array([np.nan if value in __NA_VALUES else value for value in values], dtype=object)
+
 ##################################################
 # CSVファイルから高層の気象データを読み込み、
 # DataFrameを返す